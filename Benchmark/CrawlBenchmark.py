@@ -0,0 +1,125 @@
+import os
+import argparse
+import shutil
+import tempfile
+import time
+from Class.LoggingConfig import LoggingConfig, logging
+from Class.HttpClient import HttpClient
+from Class.CrawlMetrics import CrawlMetrics
+from Class.CrawlState import CrawlState
+from Class.Subject import Subject
+from Crawler.PostSearchCrawler import PostSearchCrawler
+from Crawler.PostDocument import PostDocument
+from Crawler.AsyncCrawlEngine import AsyncCrawlEngine
+from Crawler.ImageDownloadScheduler import ImageDownloadScheduler
+from Benchmark.MockNaverServer import MockNaverServer
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+def get_max_rss_mib():
+    if resource is None:
+        return None
+
+    # ru_maxrss is in KiB on Linux and in bytes on macOS.
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return max_rss / 1024 / 1024 if max_rss > 1024 * 1024 * 1024 else max_rss / 1024
+
+
+def run_crawl(args, mock_server: MockNaverServer, output_path: str) -> int:
+    crawl_state = CrawlState(os.path.join(output_path, "crawl_state.db"))
+    subject = Subject(
+        name="benchmark",
+        keywords=["도쿄"],
+        search_date=mock_server.search_date,
+        output_path=os.path.join(output_path, "benchmark", str(mock_server.search_date)),
+        count_per_page=args.count_per_page,
+        include_content_keyword=args.include_content_keyword,
+        max_search_page=None,
+        min_image_count=1,
+        workers=args.workers,
+        crawl_state=crawl_state
+    )
+
+    if args.engine == 'async':
+        AsyncCrawlEngine(connections_per_host=args.connections_per_host).run([subject])
+    else:
+        subject.run()
+
+    post_count = sum(crawl_state.get_status_counts(subject.name, subject.search_key).values())
+    crawl_state.close()
+
+    return post_count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end crawl benchmark against a local mock Naver server")
+    parser.add_argument("--post_count", type=int, default=200, help="Posts served by the mock server")
+    parser.add_argument("--image_count", type=int, default=5, help="Images per post page")
+    parser.add_argument("--image_size", type=int, default=64 * 1024, help="Bytes per image")
+    parser.add_argument("--latency", type=float, default=0.02, help="Seconds the mock server adds to every response")
+    parser.add_argument("--error_rate", type=float, default=0.0, help="Fraction of requests answered with HTTP 503")
+    parser.add_argument("--record_dir", type=str, default=None, help="Directory of recorded responses to replay (see Benchmark/MockNaverServer.py)")
+    parser.add_argument("--workers", type=int, default=4, help="Number of posts processed concurrently")
+    parser.add_argument("--engine", type=str, choices=['sync', 'async'], default='sync', help="Crawling engine")
+    parser.add_argument("--count_per_page", type=int, default=10, help="Count Per Page for Search")
+    parser.add_argument("--connections_per_host", type=int, default=8, help="Max concurrent connections per host")
+    parser.add_argument("--adaptive_concurrency", action='store_true', default=False, help="Adapt the concurrent requests per host class to latency and throttling")
+    parser.add_argument("--image_download_workers", type=int, default=0, help="Threads of the image download scheduler (0: disabled)")
+    parser.add_argument("--image_bandwidth", type=float, default=None, help="Total image download bandwidth limit in MiB/s")
+    parser.add_argument("--include_content_keyword", action='store_true', default=False, help="Match the keyword in post texts")
+    parser.add_argument("--repeat", type=int, default=1, help="Crawl runs, each into a new output directory")
+    parser.add_argument("--verbose", action='store_true', default=False, help="Keep crawler logs during the runs")
+    args = parser.parse_args()
+
+    LoggingConfig.setup_logging()
+
+    mock_server = MockNaverServer(post_count=args.post_count, image_count=args.image_count,
+                                  image_size=args.image_size, latency=args.latency, error_rate=args.error_rate,
+                                  record_dir=args.record_dir).start()
+
+    PostSearchCrawler.SEARCH_URL = mock_server.search_url
+    PostDocument.POST_BASE_URL = mock_server.post_base_url
+    PostDocument.IMG_BASE_URL = mock_server.image_base_url
+    HttpClient.configure(connections_per_host=args.connections_per_host, adaptive_concurrency=args.adaptive_concurrency)
+    ImageDownloadScheduler.configure(workers=args.image_download_workers,
+                                     bandwidth=args.image_bandwidth * 1024 * 1024 if args.image_bandwidth else None)
+
+    root_logger = logging.getLogger()
+    log_level = root_logger.level
+
+    for run in range(1, args.repeat + 1):
+        output_path = tempfile.mkdtemp(prefix="nbc-benchmark-")
+        request_count = mock_server.get_request_count()
+        CrawlMetrics.reset()
+
+        if not args.verbose:
+            root_logger.setLevel(logging.WARNING)
+
+        start_time = time.perf_counter()
+        try:
+            post_count = run_crawl(args, mock_server, output_path)
+        finally:
+            elapsed_time = time.perf_counter() - start_time
+            root_logger.setLevel(log_level)
+            shutil.rmtree(output_path, ignore_errors=True)
+
+        request_count = mock_server.get_request_count() - request_count
+        max_rss_mib = get_max_rss_mib()
+
+        logging.info(f"Run {run} ({args.engine}, workers: {args.workers}, latency: {args.latency}, "
+                     f"error_rate: {args.error_rate}): "
+                     f"{post_count} posts in {elapsed_time:.2f} s, "
+                     f"{post_count / elapsed_time:.1f} posts/s, "
+                     f"{request_count / elapsed_time:.1f} requests/s, "
+                     f"max RSS {f'{max_rss_mib:.1f} MiB' if max_rss_mib is not None else 'n/a'}")
+
+    CrawlMetrics.log_summary()
+    mock_server.stop()
+
+
+if __name__ == "__main__":
+    main()
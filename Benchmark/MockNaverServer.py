@@ -0,0 +1,248 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from datetime import date, datetime, time as datetime_time, timedelta, timezone
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+from Class.LoggingConfig import LoggingConfig, logging
+from Benchmark.PostDocumentBenchmark import generate_post_page
+
+
+class MockNaverRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        status, headers, body = self.server.mock_server.handle_request(self.server.endpoint, self.path)
+
+        self.send_response(status)
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MockNaverHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients drop idle keep-alive connections at any time, which is not an error of the mock.
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class MockNaverServer:
+    ENDPOINT_SEARCH = 'search'
+    ENDPOINT_POST = 'post'
+    ENDPOINT_IMAGE = 'image'
+    ENDPOINTS = (ENDPOINT_SEARCH, ENDPOINT_POST, ENDPOINT_IMAGE)
+
+    SEARCH_PATH = '/ajax/SearchList.naver'
+    # The search API prefixes its JSON with this guard, which PostSearchCrawler.convert_text_to_json strips.
+    SEARCH_JUNK_PREFIX = ")]}',\n"
+    KST = timezone(timedelta(hours=9))
+
+    def __init__(self,
+                 post_count: int = 100,
+                 search_date: date = date(2024, 4, 8),
+                 image_count: int = 5,
+                 image_size: int = 64 * 1024,
+                 latency: float = 0.0,
+                 error_rate: float = 0.0,
+                 record_dir: str = None,
+                 host: str = '127.0.0.1',
+                 port: int = 0,
+                 seed: int = 0
+                 ):
+        self.post_count = post_count
+        self.search_date = search_date
+        self.image_count = image_count
+        self.latency = latency
+        self.error_rate = error_rate
+        self.record_dir = record_dir
+        self.host = host
+        self.port = port
+
+        self.random = random.Random(seed)
+        self.image_payload = b'\xff\xd8\xff\xe0' + self.random.randbytes(max(image_size - 4, 0))
+        self.search_items = self.generate_search_items()
+
+        self.servers = {}
+        self.request_counts = {endpoint: 0 for endpoint in self.ENDPOINTS}
+        self.lock = threading.Lock()
+
+    def start(self):
+        for i, endpoint in enumerate(self.ENDPOINTS):
+            # Each endpoint gets its own port, like the separate Naver hosts, so per-host connection pools apply.
+            server = MockNaverHTTPServer((self.host, self.port + i if self.port else 0), MockNaverRequestHandler)
+            server.mock_server = self
+            server.endpoint = endpoint
+            threading.Thread(target=server.serve_forever, name=f"MockNaver-{endpoint}", daemon=True).start()
+            self.servers[endpoint] = server
+
+        logging.info(f"Start MockNaverServer "
+                     f"(search_url: {self.search_url}, "
+                     f"post_base_url: {self.post_base_url}, "
+                     f"image_base_url: {self.image_base_url}, "
+                     f"post_count: {self.post_count}, "
+                     f"latency: {self.latency}, "
+                     f"error_rate: {self.error_rate}, "
+                     f"record_dir: {self.record_dir})")
+
+        return self
+
+    def stop(self):
+        for server in self.servers.values():
+            server.shutdown()
+            server.server_close()
+
+    def get_base_url(self, endpoint: str) -> str:
+        host, port = self.servers[endpoint].server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def search_url(self) -> str:
+        return self.get_base_url(self.ENDPOINT_SEARCH) + self.SEARCH_PATH
+
+    @property
+    def post_base_url(self) -> str:
+        return self.get_base_url(self.ENDPOINT_POST)
+
+    @property
+    def image_base_url(self) -> str:
+        return self.get_base_url(self.ENDPOINT_IMAGE)
+
+    def get_request_count(self) -> int:
+        with self.lock:
+            return sum(self.request_counts.values())
+
+    def generate_search_items(self) -> list:
+        # All posts are spread over search_date, newest first, followed by a page of older posts that ends the search.
+        day_end = datetime.combine(self.search_date, datetime_time(23, 59), tzinfo=self.KST)
+        step = timedelta(days=1) / (self.post_count + 1)
+
+        add_dates = [day_end - step * i for i in range(self.post_count)]
+        add_dates += [day_end - timedelta(days=1, hours=i) for i in range(10)]
+
+        return [{
+            'postUrl': f"https://blog.naver.com/benchmark{i % 20}/{223400000000 + i}",
+            'title': f"도쿄 여행 {i}일차",
+            'contents': "도쿄 여행 맛집 정리",
+            'nickName': f"nick{i % 20}",
+            'blogName': f"blog{i % 20}",
+            'addDate': int(add_date.timestamp() * 1000),
+            'thumbnails': [{'url': f"https://blogthumb.pstatic.net/{i}.jpg"}],
+            'product': None,
+            'hasThumbnail': True,
+            'marketPost': False,
+        } for i, add_date in enumerate(add_dates)]
+
+    def read_record_file(self, *path_parts):
+        if self.record_dir is None:
+            return None
+
+        record_path = os.path.join(self.record_dir, *path_parts)
+        if not os.path.isfile(record_path):
+            return None
+
+        with open(record_path, 'rb') as record_file:
+            return record_file.read()
+
+    def handle_request(self, endpoint: str, path: str) -> tuple:
+        with self.lock:
+            self.request_counts[endpoint] += 1
+            is_error = self.random.random() < self.error_rate
+
+        if self.latency:
+            time.sleep(self.latency)
+
+        if is_error:
+            return 503, {'Content-Type': 'text/plain'}, b'Service Unavailable'
+
+        parsed_path = urlparse(path)
+        query = {key: values[0] for key, values in parse_qs(parsed_path.query).items()}
+
+        if endpoint == self.ENDPOINT_SEARCH and parsed_path.path == self.SEARCH_PATH:
+            return self.get_search_response(int(query.get('currentPage', 1)), int(query.get('countPerPage', 7)))
+        if endpoint == self.ENDPOINT_POST:
+            return self.get_post_response(parsed_path.path, query)
+        if endpoint == self.ENDPOINT_IMAGE:
+            return self.get_image_response(parsed_path.path)
+
+        return 404, {'Content-Type': 'text/plain'}, b'Not Found'
+
+    def get_search_response(self, page: int, count_per_page: int) -> tuple:
+        body = self.read_record_file('search', f"{page}.json")
+
+        if body is None:
+            if self.read_record_file('search', "1.json") is not None:
+                search_items = []
+            else:
+                search_items = self.search_items[(page - 1) * count_per_page:page * count_per_page]
+
+            body = (self.SEARCH_JUNK_PREFIX + json.dumps({'result': {'searchList': search_items}},
+                                                         ensure_ascii=False)).encode('utf-8')
+
+        return 200, {'Content-Type': 'application/json;charset=UTF-8'}, body
+
+    def get_post_response(self, path: str, query: dict) -> tuple:
+        if 'blogId' in query and 'logNo' in query:
+            blog_id, log_no = query['blogId'], query['logNo']
+        else:
+            path_parts = path.strip('/').split('/')
+            if len(path_parts) != 2 or not path_parts[1].isdigit():
+                return 404, {'Content-Type': 'text/plain'}, b'Not Found'
+            blog_id, log_no = path_parts
+
+        body = self.read_record_file('post', blog_id, f"{log_no}.html")
+        if body is None:
+            body = generate_post_page(component_count=20, image_count=self.image_count, script_count=10,
+                                      post_no=int(log_no))
+
+        return 200, {'Content-Type': 'text/html;charset=UTF-8', 'ETag': f'"{blog_id}-{log_no}"'}, body
+
+    def get_image_response(self, path: str) -> tuple:
+        body = self.read_record_file('image', os.path.basename(path))
+        if body is None:
+            body = self.image_payload
+
+        return 200, {'Content-Type': 'image/jpeg'}, body
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local mock of the Naver search API, post pages and images")
+    parser.add_argument("--port", type=int, default=18700, help="First of the three ports (search, post, image)")
+    parser.add_argument("--post_count", type=int, default=100, help="Generated posts on --search_date")
+    parser.add_argument("--search_date", type=date.fromisoformat, default=date(2024, 4, 8), help="Upload date of the generated posts in YYYY-MM-DD format")
+    parser.add_argument("--image_count", type=int, default=5, help="Images per generated post page")
+    parser.add_argument("--image_size", type=int, default=64 * 1024, help="Bytes per generated image")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every response")
+    parser.add_argument("--error_rate", type=float, default=0.0, help="Fraction of requests answered with HTTP 503")
+    parser.add_argument("--record_dir", type=str, default=None, help="Directory of recorded responses to replay (search/<page>.json, post/<blogId>/<logNo>.html, image/<file name>)")
+    args = parser.parse_args()
+
+    LoggingConfig.setup_logging()
+
+    mock_server = MockNaverServer(post_count=args.post_count, search_date=args.search_date,
+                                  image_count=args.image_count, image_size=args.image_size, latency=args.latency,
+                                  error_rate=args.error_rate, record_dir=args.record_dir, port=args.port).start()
+
+    logging.info(f"Crawl the mock server with: --search_url {mock_server.search_url} "
+                 f"--post_base_url {mock_server.post_base_url} --image_base_url {mock_server.image_base_url}")
+
+    try:
+        while True:
+            time.sleep(60)
+    except KeyboardInterrupt:
+        mock_server.stop()
+
+
+if __name__ == "__main__":
+    main()
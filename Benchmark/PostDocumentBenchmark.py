@@ -0,0 +1,89 @@
+import argparse
+import json
+import html
+import time
+from Class.LoggingConfig import LoggingConfig, logging
+from Crawler.PostDocument import PostDocument, lxml
+
+
+def generate_post_page(component_count: int, image_count: int, script_count: int, post_no: int = 0,
+                       has_tricky_markup: bool = False) -> bytes:
+    img_infos = [{"id": f"SE-{i}", "path": f"/MjAyNDA0MTBfMTAw/MDAxNzEy{post_no}_{i}.JPEG/IMG_{i}.JPEG", "width": 966}
+                 for i in range(image_count)]
+    attach_image_info = html.escape(json.dumps(img_infos, separators=(',', ':')))
+
+    scripts = ''.join(f'<script type="text/javascript">var data{i} = {{"key": "{"x" * 2000}"}};</script>\n'
+                      for i in range(script_count))
+    components = ''.join(
+        f'<div class="se-component se-text se-l-default"><div class="se-component-content">'
+        f'<div class="se-section se-section-text"><div class="se-module se-module-text">'
+        f'<!-- SE-TEXT {{ --><p class="se-text-paragraph"><span class="se-fs-">도쿄 여행 {i}일차 &amp; 맛집&nbsp;정리</span>'
+        f'</p><!-- }} SE-TEXT --></div></div></div></div>\n'
+        f'<div class="se-component se-image"><div class="se-component-content"><div class="se-section se-section-image">'
+        f'<a class="se-module-image-link"><img src="https://postfiles.pstatic.net/{i}.JPEG" alt=""></a>'
+        f'</div></div></div>\n'
+        for i in range(component_count)
+    )
+    if has_tricky_markup:
+        # div tags inside comments and script/style bodies must not end the main container early.
+        components += ('<div class="se-component se-text"><!-- </div> --><p>A</p>'
+                       '<script>var html = "</div></div><div>";</script><style>.se-text > div::after { content: "</div>"; }'
+                       '</style><p>B 도쿄 여행</p></div>\n')
+
+    page = (f'<!DOCTYPE html><html lang="ko"><head><meta charset="utf-8"><title>post</title>{scripts}</head>'
+            f'<body><div id="_photo_view_property" attachimagepathandidinfo="{attach_image_info}"></div>'
+            f'<div class="se-viewer"><div class="se-main-container">\n{components}</div></div>'
+            f'<div class="post_footer">footer</div></body></html>')
+
+    return page.encode('utf-8')
+
+
+def measure(parse, content: bytes, repeat: int) -> float:
+    start_time = time.perf_counter()
+    for _ in range(repeat):
+        parse(content)
+
+    return (time.perf_counter() - start_time) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PostDocument parse time benchmark")
+    parser.add_argument("--html", type=str, nargs='*', default=[], help="Saved post page HTML files (default: generated pages)")
+    parser.add_argument("--repeat", type=int, default=20, help="Parse count per page")
+    args = parser.parse_args()
+
+    LoggingConfig.setup_logging()
+
+    pages = {}
+    for html_path in args.html:
+        with open(html_path, 'rb') as html_file:
+            pages[html_path] = html_file.read()
+
+    if not pages:
+        for component_count, image_count, script_count in [(10, 5, 10), (50, 30, 30), (200, 100, 60)]:
+            pages[f"generated ({component_count} components, {image_count} images)"] = \
+                generate_post_page(component_count, image_count, script_count)
+        pages["generated (div tags in comments, script and style)"] = \
+            generate_post_page(10, 5, 10, has_tricky_markup=True)
+
+    soup_document = PostDocument(post_url="https://blog.naver.com/benchmark/1", content=b"")
+    fast_document = PostDocument(post_url="https://blog.naver.com/benchmark/1", content=b"")
+
+    logging.info(f"lxml: {'available' if lxml is not None else 'not installed (fragment parsed by BeautifulSoup)'}")
+
+    for name, content in pages.items():
+        soup_time = measure(soup_document.parse_post_document_soup, content, args.repeat)
+        fast_time = measure(fast_document.parse_post_document, content, args.repeat)
+
+        is_same = (soup_document.get_all_img_urls() == fast_document.get_all_img_urls()
+                   and soup_document.get_post_text() == fast_document.get_post_text())
+
+        logging.info(f"{name} ({len(content) / 1024:.0f} KiB): "
+                     f"BeautifulSoup {soup_time * 1000:.2f} ms, "
+                     f"fast path {fast_time * 1000:.2f} ms, "
+                     f"x{soup_time / fast_time:.1f}, "
+                     f"same result: {is_same}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+import time
+import asyncio
+import threading
+from Class.LoggingConfig import logging
+from Class.CrawlMetrics import CrawlMetrics
+
+
+class AdaptiveConcurrencyLimiter:
+    # Additive increase, multiplicative decrease: the limit grows by about one request per round of responses while
+    # the host answers quickly, and is cut when it throttles, fails or slows down.
+    THROTTLE_STATUSES = (403, 429, 500, 502, 503, 504)
+    DECREASE_FACTOR = 0.5
+    LATENCY_TOLERANCE = 2.0
+    LATENCY_SMOOTHING = 0.1
+    BASELINE_DRIFT = 0.01
+    MIN_DECREASE_INTERVAL = 0.5
+
+    REASON_THROTTLED = 'throttled'
+    REASON_ERROR = 'error'
+    REASON_LATENCY = 'latency'
+
+    def __init__(self, host_class: str, max_limit: int, min_limit: int = 1, initial_limit: float = None):
+        self.host_class = host_class
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.limit = float(initial_limit if initial_limit is not None else max(min_limit, max_limit / 2))
+
+        self.in_flight = 0
+        self.latency_ewma = None
+        self.baseline_latency = None
+        self.decreased_at = 0.0
+
+        self.lock = threading.Lock()
+        self.condition = threading.Condition(self.lock)
+        self.async_waiters = []
+
+        CrawlMetrics.set_gauge('adaptive_concurrency_limit', self.limit, host_class=host_class)
+
+    def get_capacity(self) -> int:
+        return max(self.min_limit, int(self.limit))
+
+    def acquire(self) -> float:
+        started_at = time.monotonic()
+
+        with self.condition:
+            while self.in_flight >= self.get_capacity():
+                self.condition.wait()
+            self.in_flight += 1
+
+        return time.monotonic() - started_at
+
+    async def acquire_async(self) -> float:
+        started_at = time.monotonic()
+
+        while True:
+            with self.lock:
+                if self.in_flight < self.get_capacity():
+                    self.in_flight += 1
+                    return time.monotonic() - started_at
+
+                waiter = asyncio.get_running_loop().create_future()
+                self.async_waiters.append(waiter)
+
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                with self.lock:
+                    if waiter in self.async_waiters:
+                        self.async_waiters.remove(waiter)
+                    else:
+                        # The free slot this waiter was woken for is handed to the next one.
+                        self.wake_async_waiters()
+                raise
+
+    def release(self, status, elapsed: float, is_retried: bool = False):
+        # status is the HTTP status code, or None if the request failed without a response.
+        with self.condition:
+            self.in_flight -= 1
+
+            reason = self.get_decrease_reason(status, elapsed, is_retried)
+            if reason is not None:
+                self.decrease(reason)
+            elif self.in_flight + 1 >= self.get_capacity():
+                # The limit only grows while it is actually reached, otherwise it would drift up untested.
+                self.limit = min(float(self.max_limit), self.limit + 1 / self.limit)
+
+            CrawlMetrics.set_gauge('adaptive_concurrency_limit', round(self.limit, 2), host_class=self.host_class)
+
+            self.condition.notify_all()
+            self.wake_async_waiters()
+
+    def get_decrease_reason(self, status, elapsed: float, is_retried: bool):
+        if status is None:
+            return self.REASON_ERROR
+
+        if status in self.THROTTLE_STATUSES or is_retried:
+            return self.REASON_THROTTLED
+
+        if self.latency_ewma is None:
+            self.latency_ewma = self.baseline_latency = elapsed
+            return None
+
+        self.latency_ewma += (elapsed - self.latency_ewma) * self.LATENCY_SMOOTHING
+        # The baseline follows the lowest smoothed latency and slowly rises, so it recovers after the host slows down
+        # for good.
+        self.baseline_latency = min(self.latency_ewma,
+                                    self.baseline_latency + (self.latency_ewma - self.baseline_latency) *
+                                    self.BASELINE_DRIFT)
+
+        if self.latency_ewma > self.baseline_latency * self.LATENCY_TOLERANCE:
+            return self.REASON_LATENCY
+
+        return None
+
+    def decrease(self, reason: str):
+        # Responses to requests sent before a cut carry the same signal, so the limit is cut once per round trip.
+        now = time.monotonic()
+        if now - self.decreased_at < max(self.latency_ewma or 0.0, self.MIN_DECREASE_INTERVAL):
+            return
+
+        self.decreased_at = now
+        previous_limit = self.limit
+        self.limit = max(float(self.min_limit), self.limit * self.DECREASE_FACTOR)
+
+        CrawlMetrics.increment('adaptive_concurrency_decreases_total', host_class=self.host_class, reason=reason)
+        logging.info(f"Decrease concurrency of {self.host_class} requests "
+                     f"(reason: {reason}, limit: {previous_limit:.1f} -> {self.limit:.1f})")
+
+    def wake_async_waiters(self):
+        for _ in range(min(self.get_capacity() - self.in_flight, len(self.async_waiters))):
+            waiter = self.async_waiters.pop(0)
+            waiter.get_loop().call_soon_threadsafe(self.set_waiter_result, waiter)
+
+    @staticmethod
+    def set_waiter_result(waiter):
+        if not waiter.done():
+            waiter.set_result(None)
@@ -0,0 +1,329 @@
+import os
+import json
+import time
+import threading
+from datetime import date
+from functools import partial
+from Class.LoggingConfig import logging
+from Class.JobQueue import JobQueue
+from Class.CrawlMetrics import CrawlMetrics
+from Class.CrawlState import CrawlState
+from Class.Post import Post
+from Crawler.PostDocument import PostDocument
+from Crawler.PostImageCrawler import PostImageCrawler
+
+
+class CrawlDaemon:
+    POLL_INTERVAL = 5
+    METRICS_INTERVAL = 60
+    PURGE_INTERVAL = 3600
+
+    def __init__(self,
+                 subject_info_json: str,
+                 job_queue: JobQueue,
+                 create_subject,
+                 get_search_dates,
+                 interval_minutes: float = 60,
+                 workers: int = 1,
+                 job_retention_hours: float = 24
+                 ):
+        self.subject_info_json = subject_info_json
+        self.job_queue = job_queue
+        self.create_subject = create_subject
+        self.get_search_dates = get_search_dates
+        self.interval_minutes = interval_minutes
+        self.workers = workers
+        self.job_retention_hours = job_retention_hours
+
+        self.subject_infos = {}
+        self.subject_info_mtime = None
+        self.subject_instances = {}
+        self.subject_instances_lock = threading.Lock()
+        self.running_job_ids = set()
+        self.running_job_ids_lock = threading.Lock()
+        self.stop_event = threading.Event()
+
+        logging.info(f"Init CrawlDaemon "
+                     f"(subject_info_json: {subject_info_json}, "
+                     f"interval_minutes: {interval_minutes}, "
+                     f"workers: {workers}, "
+                     f"job_retention_hours: {job_retention_hours})")
+
+    def run(self):
+        worker_threads = [threading.Thread(target=self.run_worker, name=f"CrawlWorker-{i}", daemon=True)
+                          for i in range(self.workers)]
+        for worker_thread in worker_threads:
+            worker_thread.start()
+
+        metrics_written_at = time.monotonic()
+        purged_at = None
+
+        try:
+            while not self.stop_event.is_set():
+                # Extending the leases every poll tells the other processes that the jobs of this one are alive.
+                with self.running_job_ids_lock:
+                    running_job_ids = list(self.running_job_ids)
+                self.job_queue.extend_leases(running_job_ids)
+                self.reload_subject_info()
+                self.schedule_subjects()
+                self.record_job_counts()
+
+                if time.monotonic() - metrics_written_at >= self.METRICS_INTERVAL:
+                    CrawlMetrics.write_metrics_file()
+                    metrics_written_at = time.monotonic()
+
+                if purged_at is None or time.monotonic() - purged_at >= self.PURGE_INTERVAL:
+                    self.purge_finished_jobs()
+                    purged_at = time.monotonic()
+
+                self.stop_event.wait(self.POLL_INTERVAL)
+        except KeyboardInterrupt:
+            logging.info("Stop CrawlDaemon")
+        finally:
+            self.stop_event.set()
+            for worker_thread in worker_threads:
+                worker_thread.join()
+
+            CrawlMetrics.log_summary()
+            CrawlMetrics.write_metrics_file()
+
+    def stop(self):
+        self.stop_event.set()
+
+    def reload_subject_info(self):
+        try:
+            subject_info_mtime = os.path.getmtime(self.subject_info_json)
+            if subject_info_mtime == self.subject_info_mtime:
+                return
+
+            with open(self.subject_info_json, 'r', encoding='utf-8') as file:
+                subject_info = json.load(file)
+        except (OSError, ValueError) as e:
+            logging.error(f"Failed to load {self.subject_info_json}, keep the previous subjects: {e}")
+            return
+
+        self.subject_info_mtime = subject_info_mtime
+        self.subject_infos = {subject["name"]: subject for subject in subject_info}
+
+        with self.subject_instances_lock:
+            self.subject_instances.clear()
+
+        logging.info(f"Loaded {len(self.subject_infos)} subjects from {self.subject_info_json}")
+
+    def purge_finished_jobs(self):
+        purged_count = self.job_queue.purge_finished_jobs(self.job_retention_hours * 3600)
+        if purged_count > 0:
+            logging.info(f"Purged {purged_count} finished jobs older than {self.job_retention_hours} hours")
+
+    def record_job_counts(self):
+        job_counts = self.job_queue.get_status_counts()
+
+        for job_type in JobQueue.JOB_PRIORITIES:
+            for status in (JobQueue.STATUS_PENDING, JobQueue.STATUS_RUNNING, JobQueue.STATUS_DONE,
+                           JobQueue.STATUS_FAILED):
+                CrawlMetrics.set_gauge('jobs', job_counts.get(f"{job_type} {status}", 0), job_type=job_type,
+                                       status=status)
+
+    def get_interval_seconds(self, subject_info: dict) -> float:
+        return float(subject_info.get("interval_minutes", self.interval_minutes)) * 60
+
+    def schedule_subjects(self):
+        now = time.time()
+
+        for name, subject_info in self.subject_infos.items():
+            if not self.job_queue.claim_schedule(name, now + self.get_interval_seconds(subject_info)):
+                continue
+
+            search_dates = self.get_search_dates()
+            for search_date in search_dates:
+                for keyword in subject_info["keywords"]:
+                    self.job_queue.put(JobQueue.JOB_TYPE_SEARCH, self.get_search_job_key(name, keyword, search_date),
+                                       self.get_group_key(name, search_date), {
+                        'subject': name,
+                        'keyword': keyword,
+                        'search_date': search_date.isoformat() if search_date else None,
+                    })
+
+            logging.info(f"Scheduled subject {name} "
+                         f"(keywords: {len(subject_info['keywords'])}, "
+                         f"search_dates: {len(search_dates)}, "
+                         f"jobs: {self.job_queue.get_status_counts()})")
+
+    @staticmethod
+    def get_group_key(name: str, search_date: date):
+        return f"{name}/{search_date}"
+
+    @staticmethod
+    def get_search_job_key(name: str, keyword: str, search_date: date):
+        return f"{JobQueue.JOB_TYPE_SEARCH}/{name}/{search_date}/{keyword}"
+
+    @staticmethod
+    def get_post_job_key(name: str, search_key: str, post: Post):
+        return f"{JobQueue.JOB_TYPE_POST}/{name}/{search_key}/{post.post_key}"
+
+    @staticmethod
+    def get_image_job_key(post_directory_path: str, img_url: str):
+        return f"{JobQueue.JOB_TYPE_IMAGE}/{post_directory_path}/{img_url}"
+
+    def get_job_subject_instance(self, payload: dict):
+        search_date = date.fromisoformat(payload['search_date']) if payload['search_date'] else None
+        return self.get_subject_instance(payload['subject'], search_date)
+
+    def get_subject_instance(self, name: str, search_date: date):
+        with self.subject_instances_lock:
+            subject_instance = self.subject_instances.get((name, search_date))
+            if subject_instance is None:
+                subject_instance = self.create_subject(self.subject_infos[name], search_date)
+                subject_instance.import_complete_posts_json_file()
+                self.subject_instances[(name, search_date)] = subject_instance
+
+        return subject_instance
+
+    def run_worker(self):
+        # Errors of the job queue itself, such as a locked database, do not end the worker. Only the leases of jobs
+        # that a worker still holds are extended, so a job left behind by such an error is taken again once its lease
+        # expires.
+        while not self.stop_event.is_set():
+            try:
+                job = self.job_queue.take()
+                if job is None:
+                    self.stop_event.wait(self.POLL_INTERVAL)
+                    continue
+
+                with self.running_job_ids_lock:
+                    self.running_job_ids.add(job['id'])
+                try:
+                    self.process_job(job)
+                finally:
+                    with self.running_job_ids_lock:
+                        self.running_job_ids.discard(job['id'])
+            except Exception:
+                logging.exception("Worker error, continue with the next job")
+                self.stop_event.wait(self.POLL_INTERVAL)
+
+    def process_job(self, job: dict):
+        try:
+            self.run_job(job)
+        except Exception as e:
+            logging.exception(f"Job failed (job_type: {job['job_type']}, payload: {job['payload']})")
+            if not self.job_queue.fail(job, repr(e)):
+                logging.error(f"Job gave up after {job['attempts']} attempts")
+                self.give_up_job(job)
+        else:
+            if self.job_queue.complete(job) and job['job_type'] == JobQueue.JOB_TYPE_IMAGE:
+                self.complete_post_images(job)
+
+    def run_job(self, job: dict):
+        payload = job['payload']
+
+        subject_info = self.subject_infos.get(payload['subject'])
+        if subject_info is None:
+            logging.info(f"Skip job of removed subject {payload['subject']}")
+            return
+
+        subject_instance = self.get_job_subject_instance(payload)
+
+        if job['job_type'] == JobQueue.JOB_TYPE_SEARCH:
+            self.run_search_job(subject_instance, payload['keyword'], payload)
+        elif job['job_type'] == JobQueue.JOB_TYPE_POST:
+            self.run_post_job(subject_instance, job, Post.from_dict(payload['post']))
+        elif job['job_type'] == JobQueue.JOB_TYPE_IMAGE:
+            self.run_image_job(subject_instance, Post.from_dict(payload['post']), payload['img_url'], payload['path'])
+
+    def give_up_job(self, job: dict):
+        # A post whose image can not be downloaded is searched and queued again by a later schedule.
+        payload = job['payload']
+        if job['job_type'] != JobQueue.JOB_TYPE_IMAGE or payload['subject'] not in self.subject_infos:
+            return
+
+        subject_instance = self.get_job_subject_instance(payload)
+        subject_instance.save_post_status(Post.from_dict(payload['post']), CrawlState.STATUS_FAILED_HTTP)
+
+    def complete_post_images(self, job: dict):
+        # A post is done once none of its image jobs is left, unless one of them gave up and marked it failed.
+        payload = job['payload']
+        if payload['subject'] not in self.subject_infos or self.job_queue.has_unfinished_jobs(job['group_key']):
+            return
+
+        subject_instance = self.get_job_subject_instance(payload)
+        post = Post.from_dict(payload['post'])
+        if subject_instance.crawl_state.update_post_status(subject_instance.name, subject_instance.search_key,
+                                                           post.post_url, CrawlState.STATUS_DONE,
+                                                           from_status=CrawlState.STATUS_PENDING_IMAGES):
+            CrawlMetrics.increment('posts_total', status=CrawlState.STATUS_DONE)
+
+    def run_search_job(self, subject_instance, keyword: str, payload: dict):
+        if keyword not in subject_instance.keywords:
+            logging.info(f"Skip search job of removed keyword {keyword}")
+            return
+
+        logging.info(f"Search Job Start (subject: {subject_instance.name}, keyword: {keyword}, "
+                     f"search_date: {subject_instance.search_date})")
+
+        psc = subject_instance.create_search_crawler(keyword)
+        for page_posts in psc.iter_search_pages():
+            self.put_post_jobs(subject_instance, payload, page_posts)
+
+        # The posts of the pages fetched so far are queued, the job is retried for the rest.
+        if psc.is_failed:
+            raise RuntimeError(f"Failed to search {keyword}")
+
+    def put_post_jobs(self, subject_instance, payload: dict, page_posts: list):
+        posts = subject_instance.prefilter_posts(subject_instance.get_update_target_posts(page_posts))
+
+        for post in posts:
+            self.job_queue.put(JobQueue.JOB_TYPE_POST,
+                               self.get_post_job_key(subject_instance.name, subject_instance.search_key, post),
+                               self.get_group_key(subject_instance.name, subject_instance.search_date), {
+                'subject': payload['subject'],
+                'search_date': payload['search_date'],
+                'post': post.to_dict(),
+            }, merge_payload=partial(self.merge_post_keywords, subject_instance.keywords))
+
+    @staticmethod
+    def merge_post_keywords(keywords: list, pending_payload: dict, payload: dict) -> dict:
+        # A post found by another keyword while its job is still pending keeps the keywords of both.
+        post_keywords = set(payload['post']['keywords']) | set(pending_payload['post'].get('keywords', []))
+        payload['post']['keywords'] = [keyword for keyword in keywords if keyword in post_keywords]
+        return payload
+
+    def run_post_job(self, subject_instance, job: dict, post: Post):
+        post_directory_path = subject_instance.get_post_directory_path(post)
+
+        logging.info("")
+        logging.info(f"Post Job Start: (\"{post_directory_path}\")")
+
+        post_document = PostDocument(post_url=post.post_url)
+
+        status = subject_instance.process_post_document(post, post_document, post_directory_path)
+        if status != CrawlState.STATUS_DONE:
+            return
+
+        img_urls = post_document.get_all_img_urls()
+        if not img_urls:
+            subject_instance.save_post_status(post, status)
+            return
+
+        # Images are queued as jobs of their own, so that any process can download them and a failed image is
+        # retried without fetching the post again. The post waits for them before it is done; its status is saved
+        # first, since the image jobs may be taken and finished right away.
+        subject_instance.save_post_status(post, CrawlState.STATUS_PENDING_IMAGES)
+
+        for img_url in img_urls:
+            self.job_queue.put(JobQueue.JOB_TYPE_IMAGE, self.get_image_job_key(post_directory_path, img_url),
+                               self.get_post_job_key(subject_instance.name, subject_instance.search_key, post), {
+                'subject': job['payload']['subject'],
+                'search_date': job['payload']['search_date'],
+                'post': post.to_dict(),
+                'img_url': img_url,
+                'path': post_directory_path,
+            })
+
+    @staticmethod
+    def run_image_job(subject_instance, post: Post, img_url: str, path: str):
+        full_path = PostImageCrawler.submit_img(img_url, path, image_store=subject_instance.image_store,
+                                                priority=subject_instance.get_image_priority(post)).result()
+        if full_path is None:
+            raise RuntimeError(f"Failed to download {img_url}")
+
+        subject_instance.crawl_state.save_images(post.post_url, [(img_url, full_path)])
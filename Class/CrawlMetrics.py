@@ -0,0 +1,221 @@
+import os
+import json
+import time
+import uuid
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from urllib.parse import urlparse
+from Class.LoggingConfig import logging
+
+
+class CrawlMetrics:
+    FORMAT_PROMETHEUS = 'prometheus'
+    FORMAT_JSONL = 'jsonl'
+    FORMATS = (FORMAT_PROMETHEUS, FORMAT_JSONL)
+
+    METRIC_PREFIX = 'nbc_'
+    LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+    STAGE_SEARCH = 'search'
+    STAGE_POST_FETCH = 'post_fetch'
+    STAGE_PARSE = 'parse'
+    STAGE_IMAGE_DOWNLOAD = 'image_download'
+    STAGE_DISK_WRITE = 'disk_write'
+
+    metrics_file = None
+    metrics_format = FORMAT_PROMETHEUS
+
+    _counters = {}
+    _gauges = {}
+    _histograms = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def configure(cls, metrics_file: str = None, metrics_format: str = FORMAT_PROMETHEUS):
+        cls.metrics_file = metrics_file
+        cls.metrics_format = metrics_format
+
+        logging.info(f"Configure CrawlMetrics (metrics_file: {metrics_file}, metrics_format: {metrics_format})")
+
+    @classmethod
+    def reset(cls):
+        with cls._lock:
+            cls._counters.clear()
+            cls._gauges.clear()
+            cls._histograms.clear()
+
+    @staticmethod
+    def get_metric_key(name: str, labels: dict):
+        return name, tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+    @staticmethod
+    def get_host(url: str) -> str:
+        return urlparse(url).netloc
+
+    @classmethod
+    def increment(cls, name: str, value: float = 1, **labels):
+        metric_key = cls.get_metric_key(name, labels)
+        with cls._lock:
+            cls._counters[metric_key] = cls._counters.get(metric_key, 0) + value
+
+    @classmethod
+    def set_gauge(cls, name: str, value: float, **labels):
+        metric_key = cls.get_metric_key(name, labels)
+        with cls._lock:
+            cls._gauges[metric_key] = value
+
+    @classmethod
+    def add_gauge(cls, name: str, value: float, **labels):
+        metric_key = cls.get_metric_key(name, labels)
+        with cls._lock:
+            cls._gauges[metric_key] = cls._gauges.get(metric_key, 0) + value
+
+    @classmethod
+    def observe(cls, name: str, value: float, **labels):
+        metric_key = cls.get_metric_key(name, labels)
+        with cls._lock:
+            histogram = cls._histograms.get(metric_key)
+            if histogram is None:
+                histogram = {'buckets': [0] * len(cls.LATENCY_BUCKETS), 'count': 0, 'sum': 0.0, 'max': 0.0}
+                cls._histograms[metric_key] = histogram
+
+            for i, bucket in enumerate(cls.LATENCY_BUCKETS):
+                if value <= bucket:
+                    histogram['buckets'][i] += 1
+                    break
+
+            histogram['count'] += 1
+            histogram['sum'] += value
+            histogram['max'] = max(histogram['max'], value)
+
+    @classmethod
+    @contextmanager
+    def measure_stage(cls, stage: str):
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            cls.observe('stage_seconds', time.perf_counter() - started_at, stage=stage)
+
+    @classmethod
+    def record_request(cls, url: str, status, elapsed: float):
+        host = cls.get_host(url)
+        cls.increment('http_requests_total', host=host, status=status)
+        cls.observe('http_request_seconds', elapsed, host=host)
+
+    @classmethod
+    def record_downloaded_bytes(cls, url: str, size: int):
+        cls.increment('http_downloaded_bytes_total', size, host=cls.get_host(url))
+
+    @classmethod
+    def snapshot(cls) -> dict:
+        with cls._lock:
+            return {
+                'counters': dict(cls._counters),
+                'gauges': dict(cls._gauges),
+                'histograms': {metric_key: {**histogram, 'buckets': list(histogram['buckets'])}
+                               for metric_key, histogram in cls._histograms.items()},
+            }
+
+    @staticmethod
+    def format_metric_name(metric_key, suffix: str = '', extra_labels: tuple = ()) -> str:
+        name, labels = metric_key
+        labels = labels + extra_labels
+        if not labels:
+            return f"{CrawlMetrics.METRIC_PREFIX}{name}{suffix}"
+
+        label_strings = ','.join(f'{key}="{value}"' for key, value in labels)
+        return f"{CrawlMetrics.METRIC_PREFIX}{name}{suffix}{{{label_strings}}}"
+
+    @classmethod
+    def format_prometheus(cls, snapshot: dict) -> str:
+        lines = []
+        metric_types = {}
+
+        def add_type_line(name, metric_type):
+            if name not in metric_types:
+                metric_types[name] = metric_type
+                lines.append(f"# TYPE {cls.METRIC_PREFIX}{name} {metric_type}")
+
+        for metric_key, value in sorted(snapshot['counters'].items()):
+            add_type_line(metric_key[0], 'counter')
+            lines.append(f"{cls.format_metric_name(metric_key)} {value}")
+
+        for metric_key, value in sorted(snapshot['gauges'].items()):
+            add_type_line(metric_key[0], 'gauge')
+            lines.append(f"{cls.format_metric_name(metric_key)} {value}")
+
+        for metric_key, histogram in sorted(snapshot['histograms'].items()):
+            add_type_line(metric_key[0], 'histogram')
+
+            cumulative_count = 0
+            for bucket, count in zip(cls.LATENCY_BUCKETS, histogram['buckets']):
+                cumulative_count += count
+                lines.append(f"{cls.format_metric_name(metric_key, '_bucket', (('le', str(bucket)),))} "
+                             f"{cumulative_count}")
+            lines.append(f"{cls.format_metric_name(metric_key, '_bucket', (('le', '+Inf'),))} {histogram['count']}")
+            lines.append(f"{cls.format_metric_name(metric_key, '_sum')} {histogram['sum']:.6f}")
+            lines.append(f"{cls.format_metric_name(metric_key, '_count')} {histogram['count']}")
+
+        return '\n'.join(lines) + '\n'
+
+    @classmethod
+    def format_json_line(cls, snapshot: dict) -> str:
+        def convert_values(values: dict, convert_value):
+            metrics = {}
+            for (name, labels), value in sorted(values.items()):
+                metrics.setdefault(name, []).append({'labels': dict(labels), **convert_value(value)})
+            return metrics
+
+        return json.dumps({
+            'time': datetime.now().isoformat(timespec='seconds'),
+            'pid': os.getpid(),
+            'counters': convert_values(snapshot['counters'], lambda value: {'value': value}),
+            'gauges': convert_values(snapshot['gauges'], lambda value: {'value': value}),
+            'histograms': convert_values(snapshot['histograms'], lambda histogram: {
+                'count': histogram['count'],
+                'sum': round(histogram['sum'], 6),
+                'max': round(histogram['max'], 6),
+                'buckets': dict(zip(map(str, cls.LATENCY_BUCKETS), histogram['buckets'])),
+            }),
+        }, ensure_ascii=False)
+
+    @classmethod
+    def write_metrics_file(cls):
+        if cls.metrics_file is None:
+            return
+
+        snapshot = cls.snapshot()
+
+        try:
+            if cls.metrics_format == cls.FORMAT_JSONL:
+                with open(cls.metrics_file, 'a', encoding='utf-8') as metrics_file:
+                    metrics_file.write(cls.format_json_line(snapshot) + '\n')
+            else:
+                # Scrapers may read the file at any time, so it is replaced as a whole.
+                metrics_temp_path = f"{cls.metrics_file}.{uuid.uuid4().hex[:8]}.part"
+                with open(metrics_temp_path, 'w', encoding='utf-8') as metrics_file:
+                    metrics_file.write(cls.format_prometheus(snapshot))
+                os.replace(metrics_temp_path, cls.metrics_file)
+        except OSError as e:
+            logging.warning(f"Failed to write metrics file {cls.metrics_file}: {e}")
+
+    @classmethod
+    def log_summary(cls):
+        snapshot = cls.snapshot()
+
+        logging.info("")
+        logging.info("Crawl Metrics Summary")
+
+        for metric_key, value in sorted(snapshot['counters'].items()):
+            logging.info(f"  {cls.format_metric_name(metric_key)}: {value}")
+
+        for metric_key, value in sorted(snapshot['gauges'].items()):
+            logging.info(f"  {cls.format_metric_name(metric_key)}: {value}")
+
+        for metric_key, histogram in sorted(snapshot['histograms'].items()):
+            logging.info(f"  {cls.format_metric_name(metric_key)}: "
+                         f"count {histogram['count']}, "
+                         f"avg {histogram['sum'] / histogram['count']:.3f}s, "
+                         f"max {histogram['max']:.3f}s")
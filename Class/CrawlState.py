@@ -0,0 +1,166 @@
+import sqlite3
+import threading
+from datetime import datetime
+from Class.LoggingConfig import logging
+
+
+class CrawlState:
+    STATUS_DONE = 'done'
+    STATUS_SKIPPED_FEW_IMAGES = 'skipped_few_images'
+    STATUS_SKIPPED_NO_KEYWORD = 'skipped_no_keyword'
+    STATUS_FAILED_HTTP = 'failed_http'
+    STATUS_PENDING_IMAGES = 'pending_images'
+
+    QUERY_CHUNK_SIZE = 500
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+
+        with self.lock, self.connection:
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute("PRAGMA synchronous=NORMAL")
+            self.create_tables()
+
+        logging.info(f"Init CrawlState (db_path: {db_path})")
+
+    def create_tables(self):
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS posts (
+                subject TEXT NOT NULL,
+                search_key TEXT NOT NULL,
+                post_url TEXT NOT NULL,
+                status TEXT NOT NULL,
+                post_info TEXT,
+                attempts INTEGER NOT NULL DEFAULT 1,
+                updated_at TEXT NOT NULL,
+                PRIMARY KEY (subject, search_key, post_url)
+            )
+        """)
+
+        post_columns = {row[1] for row in self.connection.execute("PRAGMA table_info(posts)")}
+        if 'attempts' not in post_columns:
+            self.connection.execute("ALTER TABLE posts ADD COLUMN attempts INTEGER NOT NULL DEFAULT 1")
+
+        self.connection.execute("CREATE INDEX IF NOT EXISTS idx_posts_post_url ON posts (post_url)")
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS images (
+                post_url TEXT NOT NULL,
+                img_url TEXT NOT NULL,
+                file_path TEXT NOT NULL,
+                updated_at TEXT NOT NULL,
+                PRIMARY KEY (post_url, img_url, file_path)
+            )
+        """)
+        self.connection.execute("CREATE INDEX IF NOT EXISTS idx_images_img_url ON images (img_url)")
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+    @staticmethod
+    def get_now():
+        return datetime.now().isoformat(timespec='seconds')
+
+    def has_posts(self, subject: str, search_key: str) -> bool:
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT 1 FROM posts WHERE subject = ? AND search_key = ? LIMIT 1",
+                (subject, search_key)
+            ).fetchone()
+
+        return row is not None
+
+    def get_decided_post_urls(self, subject: str, search_key: str, post_urls: list, max_failed_attempts: int) -> set:
+        decided_post_urls = set()
+        post_urls = list(post_urls)
+
+        with self.lock:
+            for i in range(0, len(post_urls), self.QUERY_CHUNK_SIZE):
+                chunk = post_urls[i:i + self.QUERY_CHUNK_SIZE]
+                placeholders = ', '.join('?' * len(chunk))
+                rows = self.connection.execute(
+                    f"SELECT post_url FROM posts "
+                    f"WHERE subject = ? AND search_key = ? AND post_url IN ({placeholders}) "
+                    f"AND (status != ? OR attempts >= ?)",
+                    (subject, search_key, *chunk, self.STATUS_FAILED_HTTP, max_failed_attempts)
+                ).fetchall()
+                decided_post_urls.update(row[0] for row in rows)
+
+        return decided_post_urls
+
+    def get_status_counts(self, subject: str, search_key: str) -> dict:
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT status, COUNT(*) FROM posts WHERE subject = ? AND search_key = ? GROUP BY status",
+                (subject, search_key)
+            ).fetchall()
+
+        return dict(rows)
+
+    def save_post(self, subject: str, search_key: str, post_url: str, status: str, post_info: str = None):
+        # attempts counts the failed tries of a post only, so a post saved twice in one try is not counted twice.
+        is_failed = int(status == self.STATUS_FAILED_HTTP)
+
+        with self.lock, self.connection:
+            self.connection.execute(
+                """
+                INSERT INTO posts (subject, search_key, post_url, status, post_info, attempts, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (subject, search_key, post_url) DO UPDATE SET
+                    status = excluded.status,
+                    post_info = COALESCE(excluded.post_info, posts.post_info),
+                    attempts = posts.attempts + ?,
+                    updated_at = excluded.updated_at
+                """,
+                (subject, search_key, post_url, status, post_info, is_failed, self.get_now(), is_failed)
+            )
+
+    def update_post_status(self, subject: str, search_key: str, post_url: str, status: str, from_status: str) -> bool:
+        # The status only moves on from from_status, so that concurrent updates of a post apply once.
+        with self.lock, self.connection:
+            cursor = self.connection.execute(
+                "UPDATE posts SET status = ?, updated_at = ? "
+                "WHERE subject = ? AND search_key = ? AND post_url = ? AND status = ?",
+                (status, self.get_now(), subject, search_key, post_url, from_status)
+            )
+
+        return cursor.rowcount == 1
+
+    def get_post_info(self, subject: str, search_key: str, post_url: str):
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT post_info FROM posts WHERE subject = ? AND search_key = ? AND post_url = ?",
+                (subject, search_key, post_url)
+            ).fetchone()
+
+        return row[0] if row is not None else None
+
+    def update_post_info(self, subject: str, search_key: str, post_url: str, post_info: str):
+        with self.lock, self.connection:
+            self.connection.execute(
+                "UPDATE posts SET post_info = ? WHERE subject = ? AND search_key = ? AND post_url = ?",
+                (post_info, subject, search_key, post_url)
+            )
+
+    def save_posts(self, subject: str, search_key: str, posts: list):
+        now = self.get_now()
+
+        with self.lock, self.connection:
+            self.connection.executemany(
+                """
+                INSERT OR IGNORE INTO posts (subject, search_key, post_url, status, post_info, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                [(subject, search_key, post_url, status, post_info, now) for post_url, status, post_info in posts]
+            )
+
+    def save_images(self, post_url: str, images: list):
+        now = self.get_now()
+
+        with self.lock, self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO images (post_url, img_url, file_path, updated_at) VALUES (?, ?, ?, ?)",
+                [(post_url, img_url, file_path, now) for img_url, file_path in images]
+            )
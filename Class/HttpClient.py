@@ -0,0 +1,218 @@
+import time
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+from urllib3.util.retry import Retry
+from Class.LoggingConfig import logging
+from Class.CrawlMetrics import CrawlMetrics
+from Class.RateLimiter import RateLimiter
+from Class.AdaptiveConcurrencyLimiter import AdaptiveConcurrencyLimiter
+from Class.ResponseCache import ResponseCache
+
+
+class HttpClient:
+    BROWSER_HEADERS = {
+        'Accept-Language': 'ko-KR,ko;q=0.9',
+        'Sec-Ch-Ua': '"Chromium";v="122", "Google Chrome";v="122", ";Not A Brand";v="99"',
+        'Sec-Ch-Ua-Mobile': '?0',
+        'Sec-Ch-Ua-Platform': '"Windows"',
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36',
+    }
+    SEARCH_HEADERS = {
+        'Accept': 'application/json, text/plain, */*',
+        'Accept-Encoding': 'gzip, deflate, br',
+        'Referer': 'https://section.blog.naver.com/Search/Post.naver',
+        'Sec-Fetch-Dest': 'empty',
+        'Sec-Fetch-Mode': 'cors',
+        'Sec-Fetch-Site': 'same-origin',
+    }
+    RETRY_STATUS_FORCELIST = (429, 500, 502, 503, 504)
+
+    HOST_CLASS_SEARCH = 'search'
+    HOST_CLASS_POST = 'post'
+    HOST_CLASS_IMAGE = 'image'
+    HOST_CLASSES = (HOST_CLASS_SEARCH, HOST_CLASS_POST, HOST_CLASS_IMAGE)
+
+    timeout = 30
+    max_retries = 3
+    backoff_factor = 0.5
+    connections_per_host = 10
+    rate_limiter = None
+    response_cache = None
+    concurrency_limiters = {}
+
+    _session = None
+    _lock = threading.Lock()
+
+    @classmethod
+    def configure(cls,
+                  timeout: float = 30,
+                  max_retries: int = 3,
+                  backoff_factor: float = 0.5,
+                  connections_per_host: int = 10,
+                  rate_limit: float = None,
+                  response_cache: ResponseCache = None,
+                  adaptive_concurrency: bool = False
+                  ):
+        with cls._lock:
+            cls.timeout = timeout
+            cls.max_retries = max_retries
+            cls.backoff_factor = backoff_factor
+            cls.connections_per_host = connections_per_host
+            cls.rate_limiter = RateLimiter(rate=rate_limit) if rate_limit else None
+            cls.response_cache = response_cache
+            # Every host class gets its own limit, up to the connection pool size of a host.
+            cls.concurrency_limiters = {
+                host_class: AdaptiveConcurrencyLimiter(host_class, max_limit=connections_per_host)
+                for host_class in cls.HOST_CLASSES
+            } if adaptive_concurrency else {}
+
+            if cls._session is not None:
+                cls._session.close()
+                cls._session = None
+
+        logging.info(f"Configure HttpClient "
+                     f"(timeout: {timeout}, "
+                     f"max_retries: {max_retries}, "
+                     f"backoff_factor: {backoff_factor}, "
+                     f"connections_per_host: {connections_per_host}, "
+                     f"rate_limit: {rate_limit}, "
+                     f"response_cache: {response_cache is not None}, "
+                     f"adaptive_concurrency: {adaptive_concurrency})")
+
+    @classmethod
+    def get_session(cls) -> requests.Session:
+        with cls._lock:
+            if cls._session is None:
+                cls._session = cls.create_session()
+            return cls._session
+
+    @classmethod
+    def create_session(cls) -> requests.Session:
+        retry = Retry(
+            total=cls.max_retries,
+            backoff_factor=cls.backoff_factor,
+            status_forcelist=cls.RETRY_STATUS_FORCELIST,
+            allowed_methods=frozenset(['GET', 'HEAD']),
+            respect_retry_after_header=True,
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=10, pool_maxsize=cls.connections_per_host, pool_block=True,
+                              max_retries=retry)
+
+        session = requests.Session()
+        session.headers.update(cls.BROWSER_HEADERS)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+
+        return session
+
+    @classmethod
+    def get(cls, url, cache_endpoint: str = None, host_class: str = None, **kwargs) -> requests.Response:
+        kwargs.setdefault('timeout', cls.timeout)
+
+        response_cache = cls.response_cache if cache_endpoint is not None else None
+        cache_entry = None
+
+        if response_cache is not None:
+            cache_entry = response_cache.load(url, kwargs.get('params'))
+            if cache_entry is not None:
+                if response_cache.is_fresh(cache_entry, cache_endpoint):
+                    logging.debug(f"Response cache hit: {url}")
+                    CrawlMetrics.increment('response_cache_total', endpoint=cache_endpoint, result='hit')
+                    return cls.create_cached_response(url, cache_entry)
+
+                kwargs['headers'] = {**(kwargs.get('headers') or {}),
+                                     **response_cache.get_conditional_headers(cache_entry)}
+
+        # The rate limit is waited for before the concurrency slot is taken, so a request waiting for a token does not
+        # hold a slot that another request could use.
+        if cls.rate_limiter is not None:
+            CrawlMetrics.increment('rate_limit_wait_seconds_total', cls.rate_limiter.acquire())
+
+        concurrency_limiter = cls.concurrency_limiters.get(host_class)
+        if concurrency_limiter is not None:
+            CrawlMetrics.increment('adaptive_concurrency_wait_seconds_total', concurrency_limiter.acquire(),
+                                   host_class=host_class)
+
+        started_at = time.perf_counter()
+        response = None
+        try:
+            response = cls.get_session().get(url, **kwargs)
+        except requests.RequestException:
+            CrawlMetrics.record_request(url, 'error', time.perf_counter() - started_at)
+            raise
+        finally:
+            elapsed = time.perf_counter() - started_at
+            if concurrency_limiter is not None:
+                if response is None:
+                    concurrency_limiter.release(None, elapsed)
+                elif kwargs.get('stream'):
+                    cls.release_on_close(response, concurrency_limiter, elapsed)
+                else:
+                    concurrency_limiter.release(response.status_code, elapsed, is_retried=cls.is_retried(response))
+
+        CrawlMetrics.record_request(url, response.status_code, elapsed)
+        if not kwargs.get('stream'):
+            CrawlMetrics.record_downloaded_bytes(url, len(response.content))
+
+        if response_cache is not None:
+            if response.status_code == 304 and cache_entry is not None:
+                logging.debug(f"Response cache revalidated: {url}")
+                CrawlMetrics.increment('response_cache_total', endpoint=cache_endpoint, result='revalidated')
+                response_cache.refresh(cache_entry)
+                return cls.create_cached_response(url, cache_entry)
+
+            if response.status_code == 200:
+                CrawlMetrics.increment('response_cache_total', endpoint=cache_endpoint, result='miss')
+                response_cache.store(url, kwargs.get('params'), response.content, response.headers)
+
+        return response
+
+    @classmethod
+    def release_on_close(cls, response: requests.Response, concurrency_limiter: AdaptiveConcurrencyLimiter,
+                         elapsed: float):
+        # The body of a streamed response is read by the caller, so its slot is held until the response is closed.
+        # The latency signal stays the time up to the response headers.
+        close = response.close
+        is_retried = cls.is_retried(response)
+        is_released = False
+
+        def close_and_release():
+            nonlocal is_released
+            try:
+                close()
+            finally:
+                if not is_released:
+                    is_released = True
+                    concurrency_limiter.release(response.status_code, elapsed, is_retried=is_retried)
+
+        response.close = close_and_release
+
+    @classmethod
+    def is_retried(cls, response: requests.Response) -> bool:
+        # Retries of throttled requests happen inside urllib3 and are only visible in the retry history.
+        retries = getattr(response.raw, 'retries', None)
+        if retries is None:
+            return False
+
+        return any(history.error is not None or history.status in cls.RETRY_STATUS_FORCELIST
+                   for history in retries.history)
+
+    @staticmethod
+    def create_cached_response(url, cache_entry: dict) -> requests.Response:
+        response = requests.Response()
+        response.status_code = 200
+        response.url = url
+        response.headers = CaseInsensitiveDict(cache_entry['headers'])
+        response.encoding = get_encoding_from_headers(response.headers)
+        response._content = cache_entry['content']
+
+        return response
+
+    @classmethod
+    def get_backoff_time(cls, attempt: int) -> float:
+        return cls.backoff_factor * (2 ** attempt)
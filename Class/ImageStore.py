@@ -0,0 +1,84 @@
+import os
+import shutil
+import hashlib
+import uuid
+from Class.LoggingConfig import logging
+from urllib.parse import urlparse
+
+
+class ImageStore:
+    LINK_MODES = ('hardlink', 'symlink')
+
+    def __init__(self, root_path: str, link_mode: str = 'hardlink'):
+        self.root_path = root_path
+        self.link_mode = link_mode
+        self.objects_path = os.path.join(root_path, "objects")
+        self.urls_path = os.path.join(root_path, "urls")
+        self.tmp_path = os.path.join(root_path, "tmp")
+
+        for directory_path in (self.objects_path, self.urls_path, self.tmp_path):
+            os.makedirs(directory_path, exist_ok=True)
+
+        logging.info(f"Init ImageStore (root_path: {root_path}, link_mode: {link_mode})")
+
+    @staticmethod
+    def get_url_key(img_url: str):
+        return hashlib.sha256(img_url.encode('utf-8')).hexdigest()
+
+    def get_url_index_path(self, img_url: str):
+        url_key = self.get_url_key(img_url)
+        return os.path.join(self.urls_path, url_key[:2], url_key)
+
+    def find_object_path(self, img_url: str):
+        try:
+            with open(self.get_url_index_path(img_url), 'r', encoding='utf-8') as index_file:
+                object_path = os.path.join(self.objects_path, index_file.read().strip())
+        except FileNotFoundError:
+            return None
+
+        return object_path if os.path.exists(object_path) else None
+
+    def create_temp_file_path(self):
+        return os.path.join(self.tmp_path, f"{uuid.uuid4().hex}.part")
+
+    def add_object(self, temp_path: str, img_url: str, content_hash: str):
+        extension = os.path.splitext(urlparse(img_url).path)[1]
+        object_name = os.path.join(content_hash[:2], f"{content_hash}{extension}")
+        object_path = os.path.join(self.objects_path, object_name)
+
+        if os.path.exists(object_path):
+            os.remove(temp_path)
+        else:
+            os.makedirs(os.path.dirname(object_path), exist_ok=True)
+            os.replace(temp_path, object_path)
+
+        index_path = self.get_url_index_path(img_url)
+        os.makedirs(os.path.dirname(index_path), exist_ok=True)
+        index_temp_path = f"{index_path}.{uuid.uuid4().hex[:8]}.part"
+        with open(index_temp_path, 'w', encoding='utf-8') as index_file:
+            index_file.write(object_name)
+        os.replace(index_temp_path, index_path)
+
+        return object_path
+
+    def link_existing_object(self, img_url: str, full_path: str) -> bool:
+        object_path = self.find_object_path(img_url)
+        if object_path is None:
+            return False
+
+        self.link_object(object_path, full_path)
+        return True
+
+    def link_object(self, object_path: str, full_path: str):
+        link_temp_path = f"{full_path}.{uuid.uuid4().hex[:8]}.part"
+
+        try:
+            if self.link_mode == 'symlink':
+                os.symlink(os.path.relpath(object_path, os.path.dirname(full_path)), link_temp_path)
+            else:
+                os.link(object_path, link_temp_path)
+        except OSError as e:
+            logging.debug(f"Failed to {self.link_mode} {object_path}, copy instead: {e}")
+            shutil.copyfile(object_path, link_temp_path)
+
+        os.replace(link_temp_path, full_path)
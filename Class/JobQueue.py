@@ -0,0 +1,239 @@
+import json
+import time
+import sqlite3
+import threading
+from Class.LoggingConfig import logging
+
+
+class JobQueue:
+    JOB_TYPE_SEARCH = 'search'
+    JOB_TYPE_POST = 'post'
+    JOB_TYPE_IMAGE = 'image'
+    # Searches run first, and a job is not taken while jobs of a higher priority in its group are queued or running,
+    # so that the hits of every keyword are merged into a post job before it is taken.
+    JOB_PRIORITIES = {
+        JOB_TYPE_SEARCH: 0,
+        JOB_TYPE_POST: 1,
+        JOB_TYPE_IMAGE: 2,
+    }
+
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+
+    def __init__(self, db_path: str, owner: str, max_attempts: int = 5, retry_delay: float = 60,
+                 lease_seconds: float = 120):
+        self.db_path = db_path
+        self.owner = owner
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.lease_seconds = lease_seconds
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+
+        with self.lock, self.connection:
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute("PRAGMA synchronous=NORMAL")
+            self.create_tables()
+
+        logging.info(f"Init JobQueue "
+                     f"(db_path: {db_path}, "
+                     f"owner: {owner}, "
+                     f"max_attempts: {max_attempts}, "
+                     f"retry_delay: {retry_delay}, "
+                     f"lease_seconds: {lease_seconds})")
+
+    def create_tables(self):
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                job_type TEXT NOT NULL,
+                job_key TEXT NOT NULL UNIQUE,
+                group_key TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                priority INTEGER NOT NULL,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                available_at REAL NOT NULL,
+                lease_owner TEXT,
+                lease_expires_at REAL,
+                error TEXT,
+                updated_at REAL NOT NULL
+            )
+        """)
+
+        job_columns = {row[1] for row in self.connection.execute("PRAGMA table_info(jobs)")}
+        if 'lease_owner' not in job_columns:
+            self.connection.execute("ALTER TABLE jobs ADD COLUMN lease_owner TEXT")
+            self.connection.execute("ALTER TABLE jobs ADD COLUMN lease_expires_at REAL")
+            self.connection.execute("UPDATE jobs SET lease_expires_at = 0 WHERE status = 'running'")
+
+        self.connection.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, priority, available_at)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS idx_jobs_group_key ON jobs (group_key, status)")
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS schedules (
+                subject TEXT PRIMARY KEY,
+                next_run_at REAL NOT NULL
+            )
+        """)
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+    def put(self, job_type: str, job_key: str, group_key: str, payload: dict, merge_payload=None):
+        # A job that is already known is queued again with the new payload unless it is running right now.
+        # merge_payload(pending_payload, payload) combines the payload with the one of the same job still pending; the
+        # read and the write share one write transaction, so processes putting the same job do not lose each other's
+        # changes.
+        now = time.time()
+
+        with self.lock, self.connection:
+            if merge_payload is not None:
+                self.connection.execute("BEGIN IMMEDIATE")
+                row = self.connection.execute(
+                    "SELECT payload FROM jobs WHERE job_key = ? AND status = ?",
+                    (job_key, self.STATUS_PENDING)
+                ).fetchone()
+                if row is not None:
+                    payload = merge_payload(json.loads(row[0]), payload)
+
+            self.connection.execute(
+                """
+                INSERT INTO jobs (job_type, job_key, group_key, payload, priority, status, available_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (job_key) DO UPDATE SET
+                    payload = excluded.payload,
+                    status = excluded.status,
+                    attempts = CASE WHEN jobs.status = ? THEN jobs.attempts ELSE 0 END,
+                    available_at = CASE WHEN jobs.status = ? THEN jobs.available_at ELSE excluded.available_at END,
+                    error = NULL,
+                    updated_at = excluded.updated_at
+                WHERE jobs.status != ?
+                """,
+                (job_type, job_key, group_key, json.dumps(payload), self.JOB_PRIORITIES[job_type], self.STATUS_PENDING,
+                 now, now, self.STATUS_PENDING, self.STATUS_PENDING, self.STATUS_RUNNING)
+            )
+
+    def take(self):
+        # Pending jobs and running jobs whose lease has expired (their worker died) can be taken. The update only
+        # succeeds if the job is still takeable, so a job that another process took in the meantime is skipped.
+        while True:
+            now = time.time()
+
+            with self.lock, self.connection:
+                row = self.connection.execute(
+                    """
+                    SELECT id, job_type, group_key, payload, attempts FROM jobs
+                    WHERE ((status = ? AND available_at <= ?) OR (status = ? AND lease_expires_at < ?))
+                    AND NOT EXISTS (
+                        SELECT 1 FROM jobs AS blocking_jobs
+                        WHERE blocking_jobs.group_key = jobs.group_key
+                        AND blocking_jobs.priority < jobs.priority
+                        AND blocking_jobs.status IN (?, ?)
+                    )
+                    ORDER BY priority, available_at, id LIMIT 1
+                    """,
+                    (self.STATUS_PENDING, now, self.STATUS_RUNNING, now, self.STATUS_PENDING, self.STATUS_RUNNING)
+                ).fetchone()
+                if row is None:
+                    return None
+
+                cursor = self.connection.execute(
+                    """
+                    UPDATE jobs SET status = ?, attempts = attempts + 1, lease_owner = ?, lease_expires_at = ?,
+                        updated_at = ?
+                    WHERE id = ? AND ((status = ? AND available_at <= ?) OR (status = ? AND lease_expires_at < ?))
+                    """,
+                    (self.STATUS_RUNNING, self.owner, now + self.lease_seconds, now, row[0],
+                     self.STATUS_PENDING, now, self.STATUS_RUNNING, now)
+                )
+
+            if cursor.rowcount == 1:
+                job_id, job_type, group_key, payload, attempts = row
+                return {'id': job_id, 'job_type': job_type, 'group_key': group_key, 'payload': json.loads(payload),
+                        'attempts': attempts + 1}
+
+    def extend_leases(self, job_ids: list) -> int:
+        if not job_ids:
+            return 0
+
+        with self.lock, self.connection:
+            cursor = self.connection.execute(
+                f"UPDATE jobs SET lease_expires_at = ? WHERE status = ? AND lease_owner = ? "
+                f"AND id IN ({', '.join('?' * len(job_ids))})",
+                (time.time() + self.lease_seconds, self.STATUS_RUNNING, self.owner, *job_ids)
+            )
+
+        return cursor.rowcount
+
+    def complete(self, job: dict) -> bool:
+        with self.lock, self.connection:
+            cursor = self.connection.execute(
+                "UPDATE jobs SET status = ?, lease_owner = NULL, lease_expires_at = NULL, error = NULL, updated_at = ? "
+                "WHERE id = ? AND status = ? AND lease_owner = ?",
+                (self.STATUS_DONE, time.time(), job['id'], self.STATUS_RUNNING, self.owner)
+            )
+
+        if cursor.rowcount == 0:
+            logging.warning(f"Lease of job {job['id']} was lost before it was acknowledged")
+
+        return cursor.rowcount == 1
+
+    def fail(self, job: dict, error: str) -> bool:
+        now = time.time()
+        is_retryable = job['attempts'] < self.max_attempts
+
+        with self.lock, self.connection:
+            self.connection.execute(
+                "UPDATE jobs SET status = ?, available_at = ?, lease_owner = NULL, lease_expires_at = NULL, "
+                "error = ?, updated_at = ? "
+                "WHERE id = ? AND status = ? AND lease_owner = ?",
+                (self.STATUS_PENDING if is_retryable else self.STATUS_FAILED,
+                 now + self.retry_delay * job['attempts'], error, now, job['id'], self.STATUS_RUNNING, self.owner)
+            )
+
+        return is_retryable
+
+    def has_unfinished_jobs(self, group_key: str) -> bool:
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT 1 FROM jobs WHERE group_key = ? AND status IN (?, ?) LIMIT 1",
+                (group_key, self.STATUS_PENDING, self.STATUS_RUNNING)
+            ).fetchone()
+
+        return row is not None
+
+    def purge_finished_jobs(self, older_than_seconds: float) -> int:
+        # Done and failed jobs are only kept for inspection; a job put again later is inserted anew.
+        with self.lock, self.connection:
+            cursor = self.connection.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND updated_at < ?",
+                (self.STATUS_DONE, self.STATUS_FAILED, time.time() - older_than_seconds)
+            )
+
+        return cursor.rowcount
+
+    def get_status_counts(self) -> dict:
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT job_type || ' ' || status, COUNT(*) FROM jobs GROUP BY job_type, status"
+            ).fetchall()
+
+        return dict(rows)
+
+    def claim_schedule(self, subject: str, next_run_at: float) -> bool:
+        # Only one process moves a due schedule forward, so a subject is scheduled once per interval.
+        now = time.time()
+
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT OR IGNORE INTO schedules (subject, next_run_at) VALUES (?, ?)", (subject, 0)
+            )
+            cursor = self.connection.execute(
+                "UPDATE schedules SET next_run_at = ? WHERE subject = ? AND next_run_at <= ?",
+                (next_run_at, subject, now)
+            )
+
+        return cursor.rowcount == 1
@@ -0,0 +1,105 @@
+import re
+
+
+class KeywordMatcher:
+    def __init__(self, keywords):
+        if isinstance(keywords, str):
+            keywords = [keywords]
+
+        self.keywords = list(keywords)
+        self.keywords_by_normalized = {}
+        for keyword in self.keywords:
+            self.keywords_by_normalized.setdefault(self.normalize_keyword(keyword).lower(), []).append(keyword)
+
+        self.normalized_lengths = sorted({len(normalized) for normalized in self.keywords_by_normalized}, reverse=True)
+
+        # The trie pattern matches the longest keyword at a position. Wrapping it in a lookahead makes finditer try
+        # every position once, so keywords sharing a prefix ("도쿄", "도쿄여행") are all found in a single pass.
+        trie_pattern = self.build_trie_pattern(self.keywords_by_normalized)
+        self.search_pattern = re.compile(trie_pattern, re.IGNORECASE) if self.keywords else None
+        self.overlapped_pattern = re.compile(f"(?=({trie_pattern}))", re.IGNORECASE) if self.keywords else None
+
+        self.highlight_patterns = {keyword: re.compile(rf'({re.escape(keyword)})', flags=re.IGNORECASE)
+                                   for keyword in self.keywords}
+
+    @classmethod
+    def create(cls, keywords):
+        return keywords if isinstance(keywords, cls) else cls(keywords)
+
+    @staticmethod
+    def normalize_keyword(keyword: str) -> str:
+        return ''.join(keyword.split())
+
+    @staticmethod
+    def build_trie_pattern(words) -> str:
+        trie = {}
+        for word in words:
+            node = trie
+            for char in word:
+                node = node.setdefault(char, {})
+            node[''] = {}
+
+        return KeywordMatcher.convert_trie_to_pattern(trie)
+
+    @staticmethod
+    def convert_trie_to_pattern(node: dict) -> str:
+        branches = [re.escape(char) + KeywordMatcher.convert_trie_to_pattern(child)
+                    for char, child in node.items() if char != '']
+
+        if not branches:
+            return ''
+
+        pattern = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+
+        return f"(?:{pattern})?" if '' in node else pattern
+
+    def is_include_keyword(self, lines: list) -> bool:
+        if self.search_pattern is None or not lines:
+            return False
+
+        return self.search_pattern.search('\n'.join(lines)) is not None
+
+    def get_matching_line_indexes(self, lines: list) -> dict:
+        line_indexes_by_normalized = {}
+
+        if self.overlapped_pattern is None or not lines:
+            return line_indexes_by_normalized
+
+        text = '\n'.join(lines)
+        line_index = 0
+        line_end = len(lines[0])
+
+        for match in self.overlapped_pattern.finditer(text):
+            while match.start() > line_end:
+                line_index += 1
+                line_end += len(lines[line_index]) + 1
+
+            matched_text = match.group(1).lower()
+            for length in self.normalized_lengths:
+                if length <= len(matched_text) and matched_text[:length] in self.keywords_by_normalized:
+                    line_indexes = line_indexes_by_normalized.setdefault(matched_text[:length], [])
+                    if not line_indexes or line_indexes[-1] != line_index:
+                        line_indexes.append(line_index)
+
+        return line_indexes_by_normalized
+
+    def get_matching_contexts(self, lines: list, show_line: int = 2) -> list:
+        matching_contexts = []
+        line_indexes_by_normalized = self.get_matching_line_indexes(lines)
+
+        for keyword in self.keywords:
+            for i in line_indexes_by_normalized.get(self.normalize_keyword(keyword).lower(), []):
+                start = max(i - show_line, 0)
+                end = min(i + show_line + 1, len(lines))
+
+                context = '\n'.join(lines[start:end])
+                matching_contexts.append({keyword: context})
+
+        return matching_contexts
+
+    def highlight(self, keyword: str, context: str) -> str:
+        pattern = self.highlight_patterns.get(keyword)
+        if pattern is None:
+            pattern = re.compile(rf'({re.escape(keyword)})', flags=re.IGNORECASE)
+
+        return pattern.sub(r'**\1**', context)
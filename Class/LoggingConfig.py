@@ -1,30 +1,122 @@
 import os
 import sys
+import json
+import queue
+import atexit
 from datetime import datetime
 import logging
+import logging.handlers
+
+
+class JsonLogFormatter(logging.Formatter):
+    def format(self, record):
+        log_entry = {
+            'time': self.formatTime(record, LoggingConfig.DATE_FORMAT),
+            'level': record.levelname,
+            'logger': record.name,
+            'process': record.processName,
+            'thread': record.threadName,
+            'message': record.getMessage(),
+        }
+        if record.exc_info:
+            log_entry['exc_info'] = self.formatException(record.exc_info)
+
+        return json.dumps(log_entry, ensure_ascii=False)
 
 
 class LoggingConfig:
-    @staticmethod
-    def setup_logging():
-        formatter = logging.Formatter('(NBC) %(asctime)s [%(levelname)s]: %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
+    LOG_LEVELS = ('DEBUG', 'INFO', 'WARNING', 'ERROR')
+    LOG_FORMAT_TEXT = 'text'
+    LOG_FORMAT_JSON = 'json'
+    LOG_FORMATS = (LOG_FORMAT_TEXT, LOG_FORMAT_JSON)
 
-        root_logger = logging.getLogger()
-        root_logger.setLevel(logging.DEBUG)
+    TEXT_FORMAT = '(NBC) %(asctime)s [%(levelname)s]: %(message)s'
+    DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+    queue_listener = None
+    _is_atexit_registered = False
 
-        log_dir = os.path.join(os.getcwd(), "Logs")
+    @classmethod
+    def setup_logging(cls,
+                      log_level: str = 'DEBUG',
+                      log_format: str = LOG_FORMAT_TEXT,
+                      log_dir: str = None,
+                      log_max_bytes: int = 0,
+                      log_backup_count: int = 5
+                      ):
+        # Records are put on a queue by the crawl threads and written to the console and the log file by the
+        # listener thread, so a slow console or disk does not block crawling.
+        text_formatter = logging.Formatter(cls.TEXT_FORMAT, datefmt=cls.DATE_FORMAT)
+
+        if log_dir is None:
+            log_dir = os.path.join(os.getcwd(), "Logs")
         os.makedirs(log_dir, exist_ok=True)
 
         current_time = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-        log_file_path = os.path.join(log_dir, f"{current_time}.log")
+        log_file_extension = 'jsonl' if log_format == cls.LOG_FORMAT_JSON else 'log'
+        log_file_path = os.path.join(log_dir, f"{current_time}.{log_file_extension}")
 
-        file_handler = logging.FileHandler(log_file_path)
-        file_handler.setFormatter(formatter)
-        root_logger.addHandler(file_handler)
+        if log_max_bytes > 0:
+            file_handler = logging.handlers.RotatingFileHandler(log_file_path, maxBytes=log_max_bytes,
+                                                                backupCount=log_backup_count, encoding='utf-8')
+        else:
+            file_handler = logging.FileHandler(log_file_path, encoding='utf-8')
+        file_handler.setFormatter(JsonLogFormatter() if log_format == cls.LOG_FORMAT_JSON else text_formatter)
 
         console_handler = logging.StreamHandler()
-        console_handler.setFormatter(formatter)
-        root_logger.addHandler(console_handler)
+        console_handler.setFormatter(text_formatter)
+
+        cls.start_queue_listener(queue.SimpleQueue(), file_handler, console_handler)
+        cls.set_root_queue_handler(cls.queue_listener.queue, log_level)
+
+        if not cls._is_atexit_registered:
+            atexit.register(cls.stop_queue_listener)
+            cls._is_atexit_registered = True
+
+        cls.set_excepthook()
+
+    @classmethod
+    def setup_process_logging(cls, log_queue, log_level: str = 'DEBUG'):
+        # Worker processes send their records to the listener of the parent process through a multiprocessing queue.
+        # The listener inherited from the parent does not run in this process and is dropped without stopping it.
+        cls.queue_listener = None
+        cls.set_root_queue_handler(log_queue, log_level)
+        cls.set_excepthook()
+
+    @classmethod
+    def share_with_processes(cls, log_queue):
+        if cls.queue_listener is None:
+            return
+
+        handlers = cls.queue_listener.handlers
+        cls.stop_queue_listener()
+        cls.start_queue_listener(log_queue, *handlers)
+        cls.set_root_queue_handler(log_queue, logging.getLogger().level)
+
+    @classmethod
+    def start_queue_listener(cls, log_queue, *handlers):
+        cls.stop_queue_listener()
+        cls.queue_listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+        cls.queue_listener.start()
+
+    @classmethod
+    def stop_queue_listener(cls):
+        if cls.queue_listener is not None:
+            cls.queue_listener.stop()
+            cls.queue_listener = None
+
+    @staticmethod
+    def set_root_queue_handler(log_queue, log_level):
+        root_logger = logging.getLogger()
+        root_logger.setLevel(log_level)
+
+        for handler in list(root_logger.handlers):
+            root_logger.removeHandler(handler)
+        root_logger.addHandler(logging.handlers.QueueHandler(log_queue))
+
+    @staticmethod
+    def set_excepthook():
+        root_logger = logging.getLogger()
 
         def handle_exception(exc_type, exc_value, exc_traceback):
             if issubclass(exc_type, KeyboardInterrupt):
@@ -34,6 +126,3 @@ class LoggingConfig:
             root_logger.error("Uncaught exception", exc_info=(exc_type, exc_value, exc_traceback))
 
         sys.excepthook = handle_exception
-
-
-LoggingConfig.setup_logging()
@@ -0,0 +1,135 @@
+import re
+import json
+from datetime import datetime, timedelta
+from urllib.parse import urlparse, parse_qs
+
+
+class Post:
+    __slots__ = ('post_url', 'title', 'contents', 'nick_name', 'blog_name', 'add_date', 'thumbnails', 'product',
+                 'has_thumbnail', 'market_post', 'keywords', '_post_id')
+
+    POST_PATH_PATTERN = re.compile(r'/(?P<blog_id>[^/?#]+)/(?P<log_no>\d+)/?$')
+
+    def __init__(self,
+                 post_url: str,
+                 title: str = '',
+                 contents: str = '',
+                 nick_name: str = '',
+                 blog_name: str = '',
+                 add_date: datetime = None,
+                 thumbnails: tuple = (),
+                 product=None,
+                 has_thumbnail: bool = False,
+                 market_post: bool = False,
+                 keywords: list = None
+                 ):
+        self.post_url = post_url
+        self.title = title
+        self.contents = contents
+        self.nick_name = nick_name
+        self.blog_name = blog_name
+        self.add_date = add_date
+        self.thumbnails = tuple(thumbnails)
+        self.product = product
+        self.has_thumbnail = has_thumbnail
+        self.market_post = market_post
+        self.keywords = keywords if keywords is not None else []
+        self._post_id = None
+
+    def __repr__(self):
+        return f"Post(post_url={self.post_url!r}, add_date={self.add_date!r})"
+
+    def __eq__(self, other):
+        return isinstance(other, Post) and self.post_key == other.post_key
+
+    def __hash__(self):
+        return hash(self.post_key)
+
+    @staticmethod
+    def parse_post_url(post_url: str) -> tuple:
+        parsed_url = urlparse(post_url)
+
+        query = parse_qs(parsed_url.query)
+        if 'blogId' in query and 'logNo' in query:
+            return query['blogId'][0], query['logNo'][0]
+
+        match = Post.POST_PATH_PATTERN.search(parsed_url.path)
+        if match:
+            return match.group('blog_id'), match.group('log_no')
+
+        return None, None
+
+    def get_post_id(self) -> tuple:
+        if self._post_id is None:
+            self._post_id = self.parse_post_url(self.post_url)
+        return self._post_id
+
+    @property
+    def blog_id(self):
+        return self.get_post_id()[0]
+
+    @property
+    def log_no(self):
+        return self.get_post_id()[1]
+
+    @property
+    def post_key(self) -> str:
+        blog_id, log_no = self.get_post_id()
+        return f"{blog_id}/{log_no}" if blog_id is not None else self.post_url
+
+    @classmethod
+    def from_search_item(cls, item: dict):
+        return cls(
+            post_url=item['postUrl'],
+            title=item['title'],
+            contents=item['contents'],
+            nick_name=item.get('nickName', ''),
+            blog_name=item.get('blogName', ''),
+            add_date=datetime.utcfromtimestamp(item['addDate'] / 1000) + timedelta(hours=9),
+            thumbnails=(thumb['url'] for thumb in item['thumbnails']),
+            product=item.get('product', None),
+            has_thumbnail=item.get('hasThumbnail', False),
+            market_post=item.get('marketPost', False)
+        )
+
+    @classmethod
+    def from_dict(cls, post_dict: dict):
+        add_date = post_dict.get('addDate')
+        if isinstance(add_date, str):
+            add_date = datetime.fromisoformat(add_date)
+
+        return cls(
+            post_url=post_dict['postUrl'],
+            title=post_dict.get('title', ''),
+            contents=post_dict.get('contents', ''),
+            nick_name=post_dict.get('nickName', ''),
+            blog_name=post_dict.get('blogName', ''),
+            add_date=add_date,
+            thumbnails=post_dict.get('thumbnails', ()),
+            product=post_dict.get('product', None),
+            has_thumbnail=post_dict.get('hasThumbnail', False),
+            market_post=post_dict.get('marketPost', False),
+            keywords=list(post_dict.get('keywords', []))
+        )
+
+    def to_dict(self) -> dict:
+        return {
+            'postUrl': self.post_url,
+            'title': self.title,
+            'contents': self.contents,
+            'nickName': self.nick_name,
+            'blogName': self.blog_name,
+            'addDate': self.add_date.isoformat() if self.add_date is not None else None,
+            'thumbnails': list(self.thumbnails),
+            'product': self.product,
+            'hasThumbnail': self.has_thumbnail,
+            'marketPost': self.market_post,
+            'keywords': self.keywords
+        }
+
+    @classmethod
+    def from_json(cls, post_json: str):
+        return cls.from_dict(json.loads(post_json))
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict())
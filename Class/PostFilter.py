@@ -0,0 +1,80 @@
+import re
+import html
+from Class.LoggingConfig import logging
+from Class.CrawlMetrics import CrawlMetrics
+from Class.KeywordMatcher import KeywordMatcher
+from Class.Post import Post
+
+
+class PostFilter:
+    REASON_MARKET_POST = 'market_post'
+    REASON_NO_THUMBNAIL = 'no_thumbnail'
+    REASON_NO_KEYWORD_HINT = 'no_keyword_hint'
+    REASONS = (REASON_MARKET_POST, REASON_NO_THUMBNAIL, REASON_NO_KEYWORD_HINT)
+
+    CONFIG_KEYS = ('skip_market_posts', 'require_thumbnail', 'require_keyword_hint')
+
+    TAG_PATTERN = re.compile(r'<[^>]+>')
+
+    def __init__(self,
+                 keywords,
+                 skip_market_posts: bool = False,
+                 require_thumbnail: bool = False,
+                 require_keyword_hint: bool = False
+                 ):
+        self.keyword_matcher = KeywordMatcher.create(keywords)
+        self.skip_market_posts = skip_market_posts
+        self.require_thumbnail = require_thumbnail
+        self.require_keyword_hint = require_keyword_hint
+
+    @classmethod
+    def from_config(cls, keywords, config: dict, min_image_count: int = 0):
+        # A post without thumbnails has no images, so the rule only applies when images are required.
+        return cls(
+            keywords,
+            skip_market_posts=bool(config.get('skip_market_posts', False)),
+            require_thumbnail=bool(config.get('require_thumbnail', False)) and min_image_count > 0,
+            require_keyword_hint=bool(config.get('require_keyword_hint', False))
+        )
+
+    def is_enabled(self) -> bool:
+        return self.skip_market_posts or self.require_thumbnail or self.require_keyword_hint
+
+    def get_snippet_lines(self, post: Post) -> list:
+        # The search API highlights the keyword in the title and the snippet with HTML tags.
+        return [html.unescape(self.TAG_PATTERN.sub('', text)) for text in (post.title, post.contents) if text]
+
+    def get_reject_reason(self, post: Post):
+        if self.skip_market_posts and post.market_post:
+            return self.REASON_MARKET_POST
+
+        if self.require_thumbnail and not post.has_thumbnail and not post.thumbnails:
+            return self.REASON_NO_THUMBNAIL
+
+        if self.require_keyword_hint and not self.keyword_matcher.is_include_keyword(self.get_snippet_lines(post)):
+            return self.REASON_NO_KEYWORD_HINT
+
+        return None
+
+    def filter_posts(self, posts: list) -> list:
+        if not self.is_enabled():
+            return posts
+
+        accepted_posts = []
+        reject_counts = {}
+
+        for post in posts:
+            reason = self.get_reject_reason(post)
+            if reason is None:
+                accepted_posts.append(post)
+            else:
+                reject_counts[reason] = reject_counts.get(reason, 0) + 1
+
+        for reason, count in reject_counts.items():
+            CrawlMetrics.increment('prefiltered_posts_total', count, reason=reason)
+
+        reject_strings = ', '.join(f"{reason}: {count}" for reason, count in sorted(reject_counts.items()))
+        logging.info(f"Prefilter Posts (accepted: {len(accepted_posts)} of {len(posts)}"
+                     f"{f', {reject_strings}' if reject_strings else ''})")
+
+        return accepted_posts
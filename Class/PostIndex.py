@@ -0,0 +1,34 @@
+from Class.Post import Post
+
+
+class PostIndex:
+    def __init__(self, posts: list = None):
+        self.posts_by_key = {}
+
+        for post in posts or []:
+            self.add(post)
+
+    def __len__(self):
+        return len(self.posts_by_key)
+
+    def __contains__(self, post: Post):
+        return post.post_key in self.posts_by_key
+
+    @staticmethod
+    def get_post_key(post_url: str):
+        return Post(post_url).post_key
+
+    def add(self, post: Post) -> bool:
+        existing_post = self.posts_by_key.get(post.post_key)
+        if existing_post is None:
+            self.posts_by_key[post.post_key] = post
+            return True
+
+        for keyword in post.keywords:
+            if keyword not in existing_post.keywords:
+                existing_post.keywords.append(keyword)
+
+        return False
+
+    def get_posts(self) -> list:
+        return list(self.posts_by_key.values())
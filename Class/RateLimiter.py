@@ -0,0 +1,35 @@
+import time
+import asyncio
+import threading
+
+
+class RateLimiter:
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self, tokens: float = 1) -> float:
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            self.tokens -= tokens
+
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def acquire(self, tokens: float = 1) -> float:
+        wait_time = self.reserve(tokens)
+        if wait_time > 0:
+            time.sleep(wait_time)
+
+        return wait_time
+
+    async def acquire_async(self, tokens: float = 1) -> float:
+        wait_time = self.reserve(tokens)
+        if wait_time > 0:
+            await asyncio.sleep(wait_time)
+
+        return wait_time
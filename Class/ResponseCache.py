@@ -0,0 +1,88 @@
+import os
+import gzip
+import json
+import time
+import hashlib
+import uuid
+from urllib.parse import urlencode
+from Class.LoggingConfig import logging
+
+
+class ResponseCache:
+    ENDPOINT_SEARCH = 'search'
+    ENDPOINT_POST = 'post'
+    DEFAULT_TTLS = {
+        ENDPOINT_SEARCH: 10 * 60,
+        ENDPOINT_POST: 7 * 24 * 60 * 60,
+    }
+    STORED_HEADERS = ('Content-Type', 'ETag', 'Last-Modified')
+
+    def __init__(self, root_path: str, ttls: dict = None):
+        self.root_path = root_path
+        self.ttls = {**self.DEFAULT_TTLS, **(ttls or {})}
+
+        os.makedirs(root_path, exist_ok=True)
+
+        logging.info(f"Init ResponseCache (root_path: {root_path}, ttls: {self.ttls})")
+
+    @staticmethod
+    def get_cache_key(url: str, params: dict = None):
+        request_url = f"{url}?{urlencode(sorted(params.items()))}" if params else url
+        return hashlib.sha256(request_url.encode('utf-8')).hexdigest()
+
+    def get_entry_path(self, url: str, params: dict = None):
+        cache_key = self.get_cache_key(url, params)
+        return os.path.join(self.root_path, cache_key[:2], f"{cache_key}.gz")
+
+    def load(self, url: str, params: dict = None):
+        entry_path = self.get_entry_path(url, params)
+
+        try:
+            stored_at = os.path.getmtime(entry_path)
+            with gzip.open(entry_path, 'rb') as entry_file:
+                headers = json.loads(entry_file.readline())
+                content = entry_file.read()
+        except FileNotFoundError:
+            return None
+        except (OSError, EOFError, ValueError) as e:
+            logging.warning(f"Broken response cache entry ignored: {entry_path} ({e})")
+            return None
+
+        return {'path': entry_path, 'headers': headers, 'content': content, 'stored_at': stored_at}
+
+    def is_fresh(self, entry: dict, endpoint: str) -> bool:
+        return time.time() - entry['stored_at'] < self.ttls.get(endpoint, 0)
+
+    @staticmethod
+    def get_conditional_headers(entry: dict) -> dict:
+        conditional_headers = {}
+
+        if entry['headers'].get('ETag'):
+            conditional_headers['If-None-Match'] = entry['headers']['ETag']
+        if entry['headers'].get('Last-Modified'):
+            conditional_headers['If-Modified-Since'] = entry['headers']['Last-Modified']
+
+        return conditional_headers
+
+    def store(self, url: str, params: dict, content: bytes, headers):
+        entry_path = self.get_entry_path(url, params)
+        stored_headers = {key: headers[key] for key in self.STORED_HEADERS if headers.get(key)}
+
+        os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+        entry_temp_path = f"{entry_path}.{uuid.uuid4().hex[:8]}.part"
+        try:
+            with gzip.open(entry_temp_path, 'wb') as entry_file:
+                entry_file.write(json.dumps(stored_headers).encode('utf-8') + b'\n')
+                entry_file.write(content)
+            os.replace(entry_temp_path, entry_path)
+        except OSError as e:
+            logging.warning(f"Failed to store response cache entry {entry_path}: {e}")
+            if os.path.exists(entry_temp_path):
+                os.remove(entry_temp_path)
+
+    @staticmethod
+    def refresh(entry: dict):
+        try:
+            os.utime(entry['path'])
+        except OSError as e:
+            logging.warning(f"Failed to refresh response cache entry {entry['path']}: {e}")
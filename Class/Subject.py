@@ -1,10 +1,20 @@
 import os
 import json
 import re
-from datetime import date, datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
 
 from Class.LoggingConfig import logging
+from Class.ImageStore import ImageStore
+from Class.CrawlState import CrawlState
+from Class.CrawlMetrics import CrawlMetrics
+from Class.KeywordMatcher import KeywordMatcher
+from Class.PostFilter import PostFilter
+from Class.Post import Post
+from Class.PostIndex import PostIndex
 from Crawler.PostSearchCrawler import PostSearchCrawler
+from Crawler.PostDocument import PostDocument
 from Crawler.PostImageCrawler import PostImageCrawler
 from Crawler.PostTextCrawler import PostTextCrawler
 
@@ -19,10 +29,18 @@ class Subject:
                  include_content_keyword: bool,
                  order_by_sim: bool = False,
                  max_search_page: int = 1,
-                 min_image_count: int = 2
+                 min_image_count: int = 2,
+                 posts: list = None,
+                 workers: int = 1,
+                 image_store: ImageStore = None,
+                 crawl_state: CrawlState = None,
+                 max_post_retries: int = 3,
+                 post_filter: PostFilter = None,
+                 priority: int = 0
                  ):
         self.name = name
         self.keywords = keywords
+        self.keyword_matcher = KeywordMatcher(keywords)
         self.search_date = search_date
         self.output_path = output_path
         self.count_per_page = count_per_page
@@ -30,9 +48,21 @@ class Subject:
         self.order_by_sim = order_by_sim
         self.max_search_page = max_search_page
         self.min_image_count = min_image_count
-
+        self.posts = posts
+        self.workers = workers
+        self.image_store = image_store
+        self.max_post_retries = max_post_retries
+        self.post_filter = post_filter
+        self.priority = priority
+
+        self.search_key = os.path.basename(os.path.normpath(self.output_path))
         self.complete_posts_json_file_path = os.path.join(self.output_path, "complete_posts.json")
 
+        if crawl_state is None:
+            self.make_subject_directory()
+            crawl_state = CrawlState(os.path.join(self.output_path, "crawl_state.db"))
+        self.crawl_state = crawl_state
+
         logging.info("")
         logging.info(f"Init Subject "
                      f"(name: {name}, "
@@ -40,30 +70,29 @@ class Subject:
                      f"output_path: {output_path}, "
                      f"count_per_page: {count_per_page}, "
                      f"order_by_sim: {order_by_sim}, "
-                     f"max_search_page: {max_search_page})")
+                     f"max_search_page: {max_search_page}, "
+                     f"workers: {workers})")
 
     def run(self):
         logging.info("")
 
-        if not os.path.exists(self.complete_posts_json_file_path):
+        self.import_complete_posts_json_file()
+
+        if not self.is_created():
             self.create()
         else:
             self.update()
 
+    def is_created(self):
+        return self.crawl_state.has_posts(self.name, self.search_key)
+
     def create(self):
         logging.info("Start Create")
 
         self.make_subject_directory()
 
-        all_posts = self.get_all_posts_from_keywords()
-
-        if len(all_posts) is 0:
-            logging.info("All Post Len is 0 Skip")
-
-        for post in all_posts:
-            self.post_job(post)
-
-        self.save_complete_posts_to_json_file(all_posts, self.complete_posts_json_file_path)
+        self.run_target_post_jobs(is_update=False)
+        self.log_status_counts()
 
     def read(self):
         pass
@@ -71,40 +100,54 @@ class Subject:
     def update(self):
         logging.info("Start Update")
 
-        complete_posts = self.load_complete_posts_from_json_file(self.complete_posts_json_file_path)
-        all_posts = self.get_all_posts_from_keywords()
+        self.run_target_post_jobs(is_update=True)
+        self.log_status_counts()
 
-        if len(all_posts) is 0:
-            logging.info("All Post Len is 0 Skip")
+    def delete(self):
+        pass
 
-        complete_post_urls = {post.get("postUrl") for post in complete_posts}
-        all_post_urls = {post.get("postUrl") for post in all_posts}
+    def get_update_target_posts(self, all_posts: list):
+        all_post_urls = [post.post_url for post in all_posts]
+        decided_post_urls = self.crawl_state.get_decided_post_urls(self.name, self.search_key, all_post_urls,
+                                                                   max_failed_attempts=self.max_post_retries + 1)
 
-        update_target_post_urls = all_post_urls - complete_post_urls
+        decided_post_keys = {PostIndex.get_post_key(post_url) for post_url in decided_post_urls}
 
-        update_target_posts = [post for post in all_posts if post.get("postUrl") in update_target_post_urls]
+        update_target_posts = [post for post in all_posts
+                               if post.post_key not in decided_post_keys]
 
         logging.info(f"Updated Posts: {len(update_target_posts)}")
 
-        if update_target_posts == 0:
-            return
+        return update_target_posts
 
-        for post in update_target_posts:
-            self.post_job(post)
+    def prefilter_posts(self, posts: list) -> list:
+        # Rejected posts are not saved, so a changed filter applies to them on the next run.
+        if self.post_filter is None:
+            return posts
 
-        self.save_complete_posts_to_json_file(all_posts, self.complete_posts_json_file_path)
+        return self.post_filter.filter_posts(posts)
 
-    def delete(self):
-        pass
+    def log_status_counts(self):
+        status_counts = self.crawl_state.get_status_counts(self.name, self.search_key)
+        status_strings = ', '.join(f"{status}: {count}" for status, count in sorted(status_counts.items()))
+        logging.info(f"Post Status ({status_strings})")
 
-    def save_complete_posts_to_json_file(self, posts: list, filename: str):
-        if os.path.exists(filename):
-            os.remove(filename)
+    def import_complete_posts_json_file(self):
+        if not os.path.exists(self.complete_posts_json_file_path) or self.is_created():
+            return
 
-        self.save_post_list_to_json_file(posts, filename)
+        complete_posts = [Post.from_dict(post) for post in
+                          self.load_complete_posts_from_json_file(self.complete_posts_json_file_path)]
+
+        logging.info(f"Import {len(complete_posts)} posts from \"{self.complete_posts_json_file_path}\"")
+
+        self.crawl_state.save_posts(self.name, self.search_key, [
+            (post.post_url, CrawlState.STATUS_DONE, post.to_json())
+            for post in complete_posts
+        ])
 
     @staticmethod
-    def load_complete_posts_from_json_file(filename: str) -> set:
+    def load_complete_posts_from_json_file(filename: str) -> list:
         loaded_posts = []
 
         try:
@@ -118,78 +161,286 @@ class Subject:
 
         return loaded_posts
 
+    def save_post_status(self, post: Post, status: str):
+        # A post waiting for its image jobs is counted once it is done.
+        if status != CrawlState.STATUS_PENDING_IMAGES:
+            CrawlMetrics.increment('posts_total', status=status)
+        self.crawl_state.save_post(
+            subject=self.name,
+            search_key=self.search_key,
+            post_url=post.post_url,
+            status=status,
+            post_info=post.to_json()
+        )
+
     def make_subject_directory(self):
         logging.info(f"Subject Directory created: \"{self.output_path}\"")
         if not os.path.exists(self.output_path):
-            os.makedirs(self.output_path)
+            os.makedirs(self.output_path, exist_ok=True)
 
-    def get_psc_result_posts(self, keyword: str):
-        bsc = PostSearchCrawler(
+    def create_search_crawler(self, keyword: str, start_date: date = None, end_date: date = None):
+        is_date_range = start_date is not None and end_date is not None
+        return PostSearchCrawler(
             keyword=keyword,
-            search_date=self.search_date,
+            search_date=None if is_date_range else self.search_date,
             count_per_page=self.count_per_page,
             order_by_sim=self.order_by_sim,
-            max_search_page=self.max_search_page
+            max_search_page=self.max_search_page,
+            start_date=start_date,
+            end_date=end_date
         )
-        return bsc.get_result_all_posts()
 
-    def get_all_posts_from_keywords(self):
-        all_posts = []
+    @staticmethod
+    def group_search_subjects(subjects: list, start_date: date = None, end_date: date = None) -> list:
+        if start_date is None or end_date is None:
+            return [[subject] for subject in subjects]
+
+        subjects_by_search = {}
+        for subject in subjects:
+            subjects_by_search.setdefault((subject.name, tuple(subject.keywords)), []).append(subject)
+
+        return list(subjects_by_search.values())
+
+    @staticmethod
+    def assign_search_results(group: list, psc_list: list, start_date: date = None, end_date: date = None):
+        if start_date is None or end_date is None:
+            for subject in group:
+                subject.posts = Subject.merge_posts(psc_list)
+            return
+
+        posts_by_date = Subject.merge_posts_by_date(psc_list)
+        for subject in group:
+            subject.posts = posts_by_date.get(subject.search_date, [])
+
+    @staticmethod
+    def search_subjects(subjects: list, start_date: date = None, end_date: date = None, workers: int = 1):
+        search_groups = Subject.group_search_subjects(subjects, start_date, end_date)
+
+        logging.info("")
+        logging.info(f"Search Subjects (groups: {len(search_groups)}, workers: {workers})")
+
+        group_psc_lists = [
+            (group, [group[0].create_search_crawler(keyword, start_date, end_date) for keyword in group[0].keywords])
+            for group in search_groups
+        ]
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(psc.fetch_posts) for _, psc_list in group_psc_lists for psc in psc_list]
+
+        for future in futures:
+            future.result()
+
+        for group, psc_list in group_psc_lists:
+            Subject.assign_search_results(group, psc_list, start_date, end_date)
+
+    @staticmethod
+    def merge_posts(psc_list: list) -> list:
+        post_index = PostIndex()
+
+        for psc in psc_list:
+            for post in psc.get_result_all_posts():
+                post_index.add(post)
+
+        return post_index.get_posts()
 
+    @staticmethod
+    def merge_posts_by_date(psc_list: list) -> dict:
+        post_index_by_date = {}
+
+        for psc in psc_list:
+            for search_date, posts in psc.get_result_posts_by_date().items():
+                post_index = post_index_by_date.setdefault(search_date, PostIndex())
+                for post in posts:
+                    post_index.add(post)
+
+        return {search_date: post_index.get_posts() for search_date, post_index in post_index_by_date.items()}
+
+    def iter_post_pages(self, merged_post_keywords: dict):
+        # Without searched posts, the keywords are searched page by page and every page is handed on right away.
+        # Only the url and keywords of every post found are kept, by its key; a post found again by a later keyword
+        # may already be processed, so its keywords are added to merged_post_keywords by its url.
+        if self.posts is not None:
+            yield self.posts
+            return
+
+        post_keywords = {}
         for keyword in self.keywords:
-            posts = self.get_psc_result_posts(keyword)
+            psc = self.create_search_crawler(keyword)
+            for page_posts in psc.iter_search_pages():
+                new_posts = []
+                for post in page_posts:
+                    found_post = post_keywords.get(post.post_key)
+                    if found_post is None:
+                        post_keywords[post.post_key] = (post.post_url, list(post.keywords))
+                        new_posts.append(post)
+                        continue
+
+                    post_url, keywords = found_post
+                    if keyword not in keywords:
+                        keywords.append(keyword)
+                    merged_post_keywords[post_url] = keywords
+
+                yield new_posts
+
+    def iter_target_posts(self, is_update: bool, merged_post_keywords: dict):
+        post_count = 0
+
+        for posts in self.iter_post_pages(merged_post_keywords):
+            post_count += len(posts)
+            if is_update:
+                posts = self.get_update_target_posts(posts)
+
+            yield from self.prefilter_posts(posts)
+
+        if post_count == 0:
+            logging.info("All Post Len is 0 Skip")
+
+    def run_target_post_jobs(self, is_update: bool):
+        merged_post_keywords = {}
+
+        self.run_post_jobs(self.iter_target_posts(is_update, merged_post_keywords))
+        self.save_merged_post_keywords(merged_post_keywords)
+
+    def save_merged_post_keywords(self, merged_post_keywords: dict):
+        # The keywords of a post are merged into the saved post found first. Posts rejected by the prefilter are not
+        # saved and are skipped.
+        for post_url, keywords in merged_post_keywords.items():
+            post_info = self.crawl_state.get_post_info(self.name, self.search_key, post_url)
+            if post_info is None:
+                continue
+
+            post = Post.from_json(post_info)
+            post_keywords = set(post.keywords) | set(keywords)
+            post.keywords = [keyword for keyword in self.keywords if keyword in post_keywords]
+
+            post_info_json_file_path = os.path.join(self.get_post_directory_path(post), "post_info.json")
+            if os.path.exists(post_info_json_file_path):
+                self.save_post_to_json_file(post, post_info_json_file_path)
+
+            self.crawl_state.update_post_info(self.name, self.search_key, post.post_url, post.to_json())
+
+    def run_post_jobs(self, posts):
+        if self.workers <= 1:
             for post in posts:
-                if post not in all_posts:
-                    all_posts.append(post)
+                CrawlMetrics.add_gauge('pending_post_jobs', 1)
+                self.post_job(post)
+            return
 
-        return all_posts
+        # Posts are taken from the iterable only as workers become free, so a streamed search stays ahead of the
+        # workers by a few posts instead of being read to the end. Finished futures are not kept, and the first error
+        # stops taking posts.
+        job_slots = threading.BoundedSemaphore(self.workers * 2)
+        errors = []
 
-    def post_job(self, post):
-        post_directory_name = self.generate_post_directory_name(post)
-        post_directory_path = os.path.join(self.output_path, post_directory_name)
+        def finish_job(future):
+            if future.cancelled():
+                CrawlMetrics.add_gauge('pending_post_jobs', -1)
+            elif future.exception() is not None:
+                errors.append(future.exception())
+            job_slots.release()
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for post in posts:
+                job_slots.acquire()
+                if errors:
+                    executor.shutdown(cancel_futures=True)
+                    break
+
+                CrawlMetrics.add_gauge('pending_post_jobs', 1)
+                executor.submit(self.post_job, post).add_done_callback(finish_job)
+
+        if errors:
+            raise errors[0]
+
+    def post_job(self, post: Post):
+        CrawlMetrics.add_gauge('pending_post_jobs', -1)
+
+        post_directory_path = self.get_post_directory_path(post)
 
         logging.info("")
         logging.info(f"Post Job Start: (\"{post_directory_path}\")")
 
-        post_url = post['postUrl']
+        post_url = post.post_url
 
-        pic = PostImageCrawler(post_url=post_url)
-        if pic.get_all_img_urls_len() < self.min_image_count:
-            logging.info(f"All Images Len is {pic.get_all_img_urls_len()} Skip")
+        post_document = PostDocument(post_url=post_url)
+
+        status = self.process_post_document(post, post_document, post_directory_path)
+        if status != CrawlState.STATUS_DONE:
             return
 
+        pic = PostImageCrawler(post_url=post_url, post_document=post_document, image_store=self.image_store)
+        downloaded_images = pic.download_all_img(path=post_directory_path, priority=self.get_image_priority(post))
+
+        self.crawl_state.save_images(post_url, downloaded_images)
+
+        if len(downloaded_images) < pic.get_all_img_urls_len():
+            logging.info(f"Downloaded {len(downloaded_images)} of {pic.get_all_img_urls_len()} Images, Retry Later")
+            status = CrawlState.STATUS_FAILED_HTTP
+
+        self.save_post_status(post, status)
+
+    def get_image_priority(self, post: Post) -> tuple:
+        # Images of subjects with a higher priority go first, then images of newer posts.
+        return -self.priority, -post.add_date.timestamp() if post.add_date is not None else 0
+
+    def process_post_document(self, post: Post, post_document: PostDocument, post_directory_path: str) -> str:
+        status, matching_contexts = self.get_post_document_status(post_document)
+        if status != CrawlState.STATUS_DONE:
+            self.save_post_status(post, status)
+            return status
+
+        self.save_post_files(post, post_directory_path, matching_contexts=matching_contexts)
+
+        return status
+
+    def get_post_directory_path(self, post: Post):
+        post_directory_name = self.generate_post_directory_name(post)
+        return os.path.join(self.output_path, post_directory_name)
+
+    def get_post_document_status(self, post_document: PostDocument):
+        # Returns the status with the keyword matching contexts of the post text, which are None unless
+        # include_content_keyword is set. The text is scanned once, the contexts are saved by save_post_files.
+        if not post_document.is_fetched:
+            logging.info("Failed to fetch post. Retry Later")
+            return CrawlState.STATUS_FAILED_HTTP, None
+
+        all_img_urls_len = len(post_document.get_all_img_urls())
+        if all_img_urls_len < self.min_image_count:
+            logging.info(f"All Images Len is {all_img_urls_len} Skip")
+            return CrawlState.STATUS_SKIPPED_FEW_IMAGES, None
+
+        matching_contexts = None
         if self.include_content_keyword:
-            ptc = PostTextCrawler(post_url=post_url)
-            if not ptc.is_include_keyword(keywords=self.keywords):
+            ptc = PostTextCrawler(post_url=post_document.post_url, post_document=post_document)
+            matching_contexts = ptc.get_include_keyword_matching_contexts(keywords=self.keyword_matcher)
+            if not matching_contexts:
                 logging.info("Post does not include specified keywords. Skip")
-                return
+                return CrawlState.STATUS_SKIPPED_NO_KEYWORD, None
 
+        return CrawlState.STATUS_DONE, matching_contexts
+
+    @CrawlMetrics.measure_stage(CrawlMetrics.STAGE_DISK_WRITE)
+    def save_post_files(self, post: Post, post_directory_path: str, matching_contexts: list = None):
         if not os.path.exists(post_directory_path):
             logging.info("Make Directory")
-            os.makedirs(post_directory_path)
+            os.makedirs(post_directory_path, exist_ok=True)
 
-        self.save_post_list_to_json_file(post, os.path.join(post_directory_path, "post_info.json"))
+        self.save_post_to_json_file(post, os.path.join(post_directory_path, "post_info.json"))
         self.save_post_info_to_txt_file(post, os.path.join(post_directory_path, "post_info.txt"))
 
-        if self.include_content_keyword:
+        if matching_contexts is not None:
             self.save_post_matching_contexts_to_txt_file(
-                matching_contexts=ptc.get_include_keyword_matching_contexts(keywords=self.keywords),
+                matching_contexts=matching_contexts,
+                keyword_matcher=self.keyword_matcher,
                 filename=os.path.join(post_directory_path, "post_matching_contexts.txt")
             )
 
-        download_all_img_path = os.path.join(post_directory_path)
-        pic.download_all_img(path=download_all_img_path)
-
     @staticmethod
-    def save_post_list_to_json_file(post: list, filename: str):
-        def datetime_converter(o):
-            if isinstance(o, datetime):
-                return o.isoformat()
-
+    def save_post_to_json_file(post: Post, filename: str):
         with open(filename, "w") as json_file:
-            json.dump(post, json_file, default=datetime_converter)
+            json.dump(post.to_dict(), json_file)
 
-    def save_post_info_to_txt_file(self, post: dict, filename: str):
+    def save_post_info_to_txt_file(self, post: Post, filename: str):
         keys = {
             'title': 'Title',
             'nickName': 'Nick Name',
@@ -199,9 +450,7 @@ class Subject:
             'blogUrlMobile': 'Blog URL (Mobile)',
         }
 
-        postUrl = post.get('postUrl', '')
-
-        blog_url_pc = postUrl.rsplit('/', 1)[0]
+        blog_url_pc = post.post_url.rsplit('/', 1)[0]
         blog_url_mobile = blog_url_pc.replace('blog.naver.com', 'm.blog.naver.com')
 
         blog_id = blog_url_pc.split('/')[-1]
@@ -216,16 +465,21 @@ class Subject:
             search_url_mobile = search_url_pc.replace('blog.naver.com', 'm.blog.naver.com')
             blog_search_url_mobile.append((keyword, search_url_mobile))
 
-        new_post = post.copy()
-        new_post['blogUrlPC'] = blog_url_pc
-        new_post['blogUrlMobile'] = blog_url_mobile
+        values = {
+            'title': post.title,
+            'nickName': post.nick_name,
+            'blogName': post.blog_name,
+            'postUrl': post.post_url,
+            'blogUrlPC': blog_url_pc,
+            'blogUrlMobile': blog_url_mobile,
+        }
 
         extra_labels = [f"Blog Search URL (PC) ({keyword})" for keyword, _ in blog_search_url_pc]
         extra_labels += [f"Blog Search URL (Mobile) ({keyword})" for keyword, _ in blog_search_url_mobile]
 
         with open(filename, 'w', encoding='utf-8') as file:
             for key, label in keys.items():
-                value = new_post.get(key, '')
+                value = values[key]
                 if not 'url' in label.lower():
                     tabs = self.get_tabs_for_windows(label)
                     file.write(f"{label}:{tabs}{value}\n")
@@ -243,7 +497,7 @@ class Subject:
                 file.write(f"\n{mobile_label}:\n{mobile_url}\n")
 
     @staticmethod
-    def save_post_matching_contexts_to_txt_file(matching_contexts, filename: str):
+    def save_post_matching_contexts_to_txt_file(matching_contexts, keyword_matcher: KeywordMatcher, filename: str):
         with open(filename, 'w', encoding='utf-8') as file:
             contexts_by_keyword = {}
 
@@ -252,9 +506,7 @@ class Subject:
                     if keyword not in contexts_by_keyword:
                         contexts_by_keyword[keyword] = []
 
-                    pattern = re.compile(rf'({re.escape(keyword)})', flags=re.IGNORECASE)
-                    bolded_context = pattern.sub(r'**\1**', context)
-                    contexts_by_keyword[keyword].append(bolded_context)
+                    contexts_by_keyword[keyword].append(keyword_matcher.highlight(keyword, context))
 
             for keyword, contexts in contexts_by_keyword.items():
                 file.write(f"[{keyword}]\n")
@@ -269,11 +521,11 @@ class Subject:
         return '\t' * tab_len
 
     @staticmethod
-    def generate_post_directory_name(post: dict):
-        addDate_str = post['addDate'].strftime('%Y-%m-%d_%H-%M-%S')
+    def generate_post_directory_name(post: Post):
+        addDate_str = post.add_date.strftime('%Y-%m-%d_%H-%M-%S')
 
-        nickName_clean = re.sub(r'[^\w\s]', '', post['nickName'])[:20].strip()
-        title_clean = re.sub(r'[^\w\s]', '', post['title'])[:20].strip()
+        nickName_clean = re.sub(r'[^\w\s]', '', post.nick_name)[:20].strip()
+        title_clean = re.sub(r'[^\w\s]', '', post.title)[:20].strip()
 
         directory_name = f"[{addDate_str}] [{nickName_clean}] [{title_clean}]"
 
@@ -0,0 +1,360 @@
+import os
+import time
+import asyncio
+from Class.LoggingConfig import logging
+from Class.HttpClient import HttpClient
+from Class.CrawlMetrics import CrawlMetrics
+from Class.CrawlState import CrawlState
+from Class.ResponseCache import ResponseCache
+from Class.Subject import Subject
+from Crawler.PostSearchCrawler import PostSearchCrawler
+from Crawler.PostDocument import PostDocument
+from Crawler.PostImageCrawler import PostImageCrawler
+from Crawler.ImageFileWriter import ImageFileWriter
+from Crawler.ImageDownloadScheduler import ImageDownloadScheduler
+from urllib.parse import urlparse
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+
+class AsyncCrawlEngine:
+    def __init__(self, connections_per_host: int = 8):
+        if aiohttp is None:
+            raise ImportError("The async engine requires aiohttp. Install it with \"pip install aiohttp\".")
+
+        self.connections_per_host = connections_per_host
+        self.search_headers = {key: value for key, value in HttpClient.SEARCH_HEADERS.items()
+                               if key != 'Accept-Encoding'}
+        self.image_host_slots = {}
+        self.img_downloads = {}
+
+        logging.info(f"Init AsyncCrawlEngine (connections_per_host: {connections_per_host})")
+
+    def run(self, subjects: list, start_date=None, end_date=None):
+        asyncio.run(self.run_subjects(subjects, start_date=start_date, end_date=end_date))
+
+    async def run_subjects(self, subjects: list, start_date=None, end_date=None):
+        connector = aiohttp.TCPConnector(limit=0, limit_per_host=self.connections_per_host)
+        timeout = aiohttp.ClientTimeout(sock_connect=HttpClient.timeout, sock_read=HttpClient.timeout)
+
+        # The slots and downloads belong to the event loop of this run.
+        self.image_host_slots = {}
+        self.img_downloads = {}
+
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout,
+                                         headers=HttpClient.BROWSER_HEADERS) as session:
+            await self.search_subjects(session, subjects, start_date=start_date, end_date=end_date)
+
+            await asyncio.gather(*(self.run_subject(session, subject) for subject in subjects))
+
+    async def run_subject(self, session, subject):
+        logging.info("")
+
+        subject.import_complete_posts_json_file()
+        is_update = subject.is_created()
+
+        if is_update:
+            logging.info("Start Update")
+        else:
+            logging.info("Start Create")
+            subject.make_subject_directory()
+
+        if subject.posts is None:
+            await self.search_subjects(session, [subject])
+
+        all_posts = subject.posts
+
+        if len(all_posts) == 0:
+            logging.info("All Post Len is 0 Skip")
+
+        target_posts = subject.get_update_target_posts(all_posts) if is_update else all_posts
+        target_posts = subject.prefilter_posts(target_posts)
+
+        await self.run_post_jobs(session, subject, target_posts)
+
+        subject.log_status_counts()
+
+    async def run_post_jobs(self, session, subject, posts: list):
+        # Like the worker pool of the sync engine, at most subject.workers posts are processed at a time, so only
+        # their documents and responses are held.
+        posts = iter(posts)
+
+        async def run_worker():
+            for post in posts:
+                await self.post_job(session, subject, post)
+
+        results = await asyncio.gather(*(run_worker() for _ in range(max(1, subject.workers))),
+                                       return_exceptions=True)
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+
+    async def search_subjects(self, session, subjects: list, start_date=None, end_date=None):
+        async def search_subject_group(group):
+            psc_list = [group[0].create_search_crawler(keyword, start_date, end_date)
+                        for keyword in group[0].keywords]
+            await asyncio.gather(*(self.fetch_search_posts(session, psc) for psc in psc_list))
+
+            Subject.assign_search_results(group, psc_list, start_date, end_date)
+
+        search_groups = Subject.group_search_subjects(subjects, start_date, end_date)
+        await asyncio.gather(*(search_subject_group(group) for group in search_groups))
+
+    async def fetch_search_posts(self, session, psc: PostSearchCrawler):
+        collect_page_posts = psc.get_page_collector()
+        if collect_page_posts is None:
+            return
+
+        page = await self.run_seek_first_page(session, psc) if psc.is_seekable() else 1
+
+        while psc.is_page_in_range(page):
+            response_list = await self.get_page_posts(session, psc, page)
+            if response_list is None:
+                break
+
+            is_continued = collect_page_posts(response_list)
+            for post in psc.take_collected_posts():
+                psc.store_post(post)
+
+            if not is_continued:
+                break
+
+            page += 1
+
+        psc.page_posts_cache.clear()
+
+    async def get_page_posts(self, session, psc: PostSearchCrawler, page: int):
+        if page in psc.page_posts_cache:
+            return psc.page_posts_cache.pop(page)
+
+        logging.info(f"Get Response (keyword: {psc.keyword}, page: {page}, count_per_page: {psc.count_per_page})")
+        params = psc.get_request_params(keyword=psc.keyword, order_by=psc.get_order_by(), page=page,
+                                        count_per_page=psc.count_per_page)
+        with CrawlMetrics.measure_stage(CrawlMetrics.STAGE_SEARCH):
+            content = await self.get_content(session, PostSearchCrawler.SEARCH_URL, params=params,
+                                             headers=self.search_headers, cache_endpoint=ResponseCache.ENDPOINT_SEARCH,
+                                             host_class=HttpClient.HOST_CLASS_SEARCH)
+            if content is None:
+                return psc.fail_page()
+
+            response_json = psc.convert_text_to_json(content.decode('utf-8', errors='replace'))
+            if response_json is None:
+                return psc.fail_page()
+
+            return psc.convert_json_to_list(response_json=response_json)
+
+    async def run_seek_first_page(self, session, psc: PostSearchCrawler):
+        seek = psc.seek_first_page()
+        page = next(seek)
+
+        try:
+            while True:
+                if page not in psc.page_posts_cache:
+                    psc.page_posts_cache[page] = await self.get_page_posts(session, psc, page)
+                if psc.page_posts_cache[page] is None:
+                    return page
+                page = seek.send(psc.page_posts_cache[page])
+        except StopIteration as stop:
+            return stop.value
+
+    async def post_job(self, session, subject, post):
+        post_directory_path = subject.get_post_directory_path(post)
+
+        logging.info("")
+        logging.info(f"Post Job Start: (\"{post_directory_path}\")")
+
+        post_url = PostDocument.adjust_post_url(post.post_url)
+
+        with CrawlMetrics.measure_stage(CrawlMetrics.STAGE_POST_FETCH):
+            content = await self.get_content(session, post_url, cache_endpoint=ResponseCache.ENDPOINT_POST,
+                                             host_class=HttpClient.HOST_CLASS_POST)
+        if content is None:
+            logging.info("Failed to fetch post. Retry Later")
+            await asyncio.to_thread(subject.save_post_status, post, CrawlState.STATUS_FAILED_HTTP)
+            return
+
+        # Parsing, SQLite writes and file writes block, so they run in threads and keep the event loop serving the
+        # other requests.
+        post_document = await asyncio.to_thread(PostDocument, post_url=post_url, content=content)
+
+        status = await asyncio.to_thread(subject.process_post_document, post, post_document, post_directory_path)
+        if status != CrawlState.STATUS_DONE:
+            return
+
+        downloaded_paths = await asyncio.gather(*(self.download_img(session, img_url, post_directory_path,
+                                                                    image_store=subject.image_store)
+                                                  for img_url in post_document.get_all_img_urls()))
+
+        downloaded_images = [
+            (img_url, full_path)
+            for img_url, full_path in zip(post_document.get_all_img_urls(), downloaded_paths)
+            if full_path is not None
+        ]
+        await asyncio.to_thread(subject.crawl_state.save_images, post.post_url, downloaded_images)
+
+        if len(downloaded_images) < len(downloaded_paths):
+            logging.info(f"Downloaded {len(downloaded_images)} of {len(downloaded_paths)} Images, Retry Later")
+            status = CrawlState.STATUS_FAILED_HTTP
+
+        await asyncio.to_thread(subject.save_post_status, post, status)
+
+    async def download_img(self, session, img_url, path, image_store=None):
+        file_name = os.path.basename(urlparse(img_url).path)
+        full_path = os.path.join(path, file_name)
+        if os.path.exists(full_path):
+            logging.debug(f"File already exists: {full_path}")
+            return full_path
+
+        if image_store is not None and await asyncio.to_thread(image_store.link_existing_object, img_url, full_path):
+            logging.info(f"Linked {img_url} as {full_path}")
+            return full_path
+
+        if not ImageDownloadScheduler.is_enabled():
+            return await self.fetch_img(session, img_url, full_path, image_store=image_store)
+
+        # Like the scheduler of the sync engine, a URL being downloaded is not requested again: the same file shares
+        # its result, another post directory gets a copy of the downloaded file.
+        img_download = self.img_downloads.get(img_url)
+        if img_download is not None:
+            CrawlMetrics.increment('image_download_deduplicated_total')
+            downloaded_path = await asyncio.shield(img_download)
+            if downloaded_path == full_path:
+                return full_path
+
+            task = {'img_url': img_url, 'full_path': full_path, 'image_store': image_store}
+            return await asyncio.to_thread(ImageDownloadScheduler.place_downloaded_image, task, downloaded_path)
+
+        img_download = asyncio.ensure_future(self.fetch_img_in_host_slot(session, img_url, full_path,
+                                                                         image_store=image_store))
+        self.img_downloads[img_url] = img_download
+        img_download.add_done_callback(lambda _: self.img_downloads.pop(img_url, None))
+
+        return await asyncio.shield(img_download)
+
+    async def fetch_img_in_host_slot(self, session, img_url, full_path, image_store=None):
+        # At most connections_per_host images of a host are downloaded at a time, as in the scheduler of the sync
+        # engine. The slot is held through the retries.
+        host = urlparse(img_url).netloc
+        host_slots = self.image_host_slots.get(host)
+        if host_slots is None:
+            host_slots = self.image_host_slots[host] = asyncio.Semaphore(ImageDownloadScheduler.connections_per_host)
+
+        async with host_slots:
+            return await self.fetch_img(session, img_url, full_path, image_store=image_store)
+
+    async def fetch_img(self, session, img_url, full_path, image_store=None):
+        async def write_response(response):
+            with ImageFileWriter(img_url, full_path, image_store=image_store) as writer:
+                async for chunk in response.content.iter_chunked(PostImageCrawler.CHUNK_SIZE):
+                    await asyncio.to_thread(writer.write, chunk)
+                    await ImageDownloadScheduler.limit_bandwidth_async(len(chunk))
+
+                CrawlMetrics.record_downloaded_bytes(img_url, writer.written_size)
+
+                if await asyncio.to_thread(writer.commit, response.headers):
+                    logging.info(f"Downloaded {img_url} as {full_path}")
+                    return full_path
+
+                logging.error(f"Failed to download {img_url} - Incomplete content "
+                              f"({writer.written_size} of {response.headers.get('Content-Length')} bytes)")
+                return None
+
+        try:
+            with CrawlMetrics.measure_stage(CrawlMetrics.STAGE_IMAGE_DOWNLOAD):
+                return await self.request_with_retries(session, img_url, read_response=write_response,
+                                                       host_class=HttpClient.HOST_CLASS_IMAGE)
+        except OSError as e:
+            logging.error(f"Error downloading {img_url}: {e}")
+            return None
+
+    async def get_content(self, session, url, params=None, headers=None, cache_endpoint: str = None,
+                          host_class: str = None):
+        response_cache = HttpClient.response_cache if cache_endpoint is not None else None
+        cache_entry = None
+
+        if response_cache is not None:
+            cache_entry = response_cache.load(url, params)
+            if cache_entry is not None:
+                if response_cache.is_fresh(cache_entry, cache_endpoint):
+                    logging.debug(f"Response cache hit: {url}")
+                    CrawlMetrics.increment('response_cache_total', endpoint=cache_endpoint, result='hit')
+                    return cache_entry['content']
+
+                headers = {**(headers or {}), **response_cache.get_conditional_headers(cache_entry)}
+
+        async def read_content(response):
+            if response.status == 304:
+                logging.debug(f"Response cache revalidated: {url}")
+                CrawlMetrics.increment('response_cache_total', endpoint=cache_endpoint, result='revalidated')
+                response_cache.refresh(cache_entry)
+                return cache_entry['content']
+
+            content = await response.read()
+            CrawlMetrics.record_downloaded_bytes(url, len(content))
+            if response_cache is not None:
+                CrawlMetrics.increment('response_cache_total', endpoint=cache_endpoint, result='miss')
+                response_cache.store(url, params, content, response.headers)
+
+            return content
+
+        ok_statuses = (200, 304) if cache_entry is not None else (200,)
+
+        return await self.request_with_retries(session, url, read_response=read_content, params=params,
+                                               headers=headers, ok_statuses=ok_statuses, host_class=host_class)
+
+    @staticmethod
+    async def request_with_retries(session, url, read_response, params=None, headers=None, ok_statuses=(200,),
+                                   host_class: str = None):
+        concurrency_limiter = HttpClient.concurrency_limiters.get(host_class)
+
+        for attempt in range(HttpClient.max_retries + 1):
+            is_last_attempt = attempt == HttpClient.max_retries
+
+            # As in HttpClient.get, the rate limit is waited for before the concurrency slot is taken.
+            if HttpClient.rate_limiter is not None:
+                CrawlMetrics.increment('rate_limit_wait_seconds_total', await HttpClient.rate_limiter.acquire_async())
+
+            if concurrency_limiter is not None:
+                CrawlMetrics.increment('adaptive_concurrency_wait_seconds_total',
+                                       await concurrency_limiter.acquire_async(), host_class=host_class)
+
+            started_at = time.perf_counter()
+            response = None
+            status = None
+            elapsed = None
+            try:
+                async with session.get(url, params=params, headers=headers) as response:
+                    status = response.status
+                    elapsed = time.perf_counter() - started_at
+                    CrawlMetrics.record_request(url, response.status, elapsed)
+
+                    if response.status in ok_statuses:
+                        return await read_response(response)
+
+                    if response.status not in HttpClient.RETRY_STATUS_FORCELIST or is_last_attempt:
+                        logging.error(f"Failed to access {url} - HTTP Status Code: {response.status}")
+                        return None
+
+                    logging.warning(f"Retry {url} - HTTP Status Code: {response.status} (attempt: {attempt + 1})")
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                status = None
+                if response is None:
+                    CrawlMetrics.record_request(url, 'error', time.perf_counter() - started_at)
+
+                if is_last_attempt:
+                    logging.error(f"Error while getting {url}: {e}")
+                    return None
+
+                logging.warning(f"Retry {url} - {e!r} (attempt: {attempt + 1})")
+            finally:
+                # The slot is held until the body is read, the latency signal is the time up to the response headers.
+                if concurrency_limiter is not None:
+                    concurrency_limiter.release(status,
+                                                elapsed if elapsed is not None else time.perf_counter() - started_at)
+
+            await asyncio.sleep(HttpClient.get_backoff_time(attempt))
+
+        return None
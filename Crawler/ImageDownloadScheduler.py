@@ -0,0 +1,209 @@
+import os
+import heapq
+import itertools
+import shutil
+import threading
+from concurrent.futures import Future
+from urllib.parse import urlparse
+from Class.LoggingConfig import logging
+from Class.CrawlMetrics import CrawlMetrics
+from Class.RateLimiter import RateLimiter
+from Crawler.ImageFileWriter import ImageFileWriter
+
+
+class ImageDownloadScheduler:
+    # Images of every post are downloaded by one pool of threads in the order of their priority (lowest first).
+    workers = 0
+    connections_per_host = 4
+    bandwidth_limiter = None
+
+    _host_tasks = {}
+    _ready_hosts = set()
+    _queued_count = 0
+    _tasks_by_url = {}
+    _host_downloads = {}
+    _threads = []
+    _is_stopped = False
+    _sequence = itertools.count()
+    _condition = threading.Condition()
+
+    @classmethod
+    def configure(cls, workers: int = 0, connections_per_host: int = 4, bandwidth: float = None):
+        cls.shutdown()
+
+        with cls._condition:
+            cls.workers = workers
+            cls.connections_per_host = connections_per_host
+            # The bucket holds one second of bandwidth, so a download never bursts above the cap for long.
+            cls.bandwidth_limiter = RateLimiter(rate=bandwidth) if bandwidth else None
+            cls._is_stopped = False
+            cls._threads = [threading.Thread(target=cls.run_worker, name=f"ImageDownloader-{i}", daemon=True)
+                            for i in range(workers)]
+
+        for thread in cls._threads:
+            thread.start()
+
+        logging.info(f"Configure ImageDownloadScheduler "
+                     f"(workers: {workers}, "
+                     f"connections_per_host: {connections_per_host}, "
+                     f"bandwidth: {bandwidth})")
+
+    @classmethod
+    def shutdown(cls):
+        with cls._condition:
+            cls._is_stopped = True
+            threads = cls._threads
+            cls._threads = []
+            cls._condition.notify_all()
+
+        for thread in threads:
+            thread.join()
+
+        with cls._condition:
+            for url_tasks in cls._tasks_by_url.values():
+                for task in url_tasks:
+                    task['future'].cancel()
+            cls._host_tasks.clear()
+            cls._ready_hosts.clear()
+            cls._queued_count = 0
+            cls._tasks_by_url.clear()
+            cls._host_downloads.clear()
+
+    @classmethod
+    def is_enabled(cls) -> bool:
+        return cls.workers > 0
+
+    @classmethod
+    def limit_bandwidth(cls, size: int):
+        if cls.bandwidth_limiter is not None:
+            CrawlMetrics.increment('image_bandwidth_wait_seconds_total', cls.bandwidth_limiter.acquire(size))
+
+    @classmethod
+    async def limit_bandwidth_async(cls, size: int):
+        if cls.bandwidth_limiter is not None:
+            wait_time = await cls.bandwidth_limiter.acquire_async(size)
+            CrawlMetrics.increment('image_bandwidth_wait_seconds_total', wait_time)
+
+    @classmethod
+    def submit(cls, img_url: str, full_path: str, download, priority: tuple = (), image_store=None) -> Future:
+        # download() saves img_url to full_path and returns full_path, or None if the download failed.
+        task = {
+            'img_url': img_url,
+            'full_path': full_path,
+            'download': download,
+            'image_store': image_store,
+            'host': urlparse(img_url).netloc,
+            'future': Future(),
+        }
+
+        with cls._condition:
+            url_tasks = cls._tasks_by_url.get(img_url)
+            if url_tasks is not None:
+                # The URL is already queued or downloading: the same file shares its result, another post directory
+                # gets a copy of the downloaded file.
+                CrawlMetrics.increment('image_download_deduplicated_total')
+                for url_task in url_tasks:
+                    if url_task['full_path'] == full_path:
+                        return url_task['future']
+
+                url_tasks.append(task)
+                return task['future']
+
+            cls._tasks_by_url[img_url] = [task]
+            heapq.heappush(cls._host_tasks.setdefault(task['host'], []), (priority, next(cls._sequence), task))
+            cls._queued_count += 1
+            cls.update_ready_host(task['host'])
+            CrawlMetrics.set_gauge('image_download_queue', cls._queued_count)
+            cls._condition.notify()
+
+        return task['future']
+
+    @classmethod
+    def update_ready_host(cls, host: str):
+        # Tasks are queued per host, and only hosts below their connection cap are looked at for the next task.
+        if cls._host_tasks.get(host) and cls._host_downloads.get(host, 0) < cls.connections_per_host:
+            cls._ready_hosts.add(host)
+        else:
+            cls._ready_hosts.discard(host)
+
+    @classmethod
+    def take_task(cls):
+        # The task of the highest priority among the ready hosts is taken.
+        if not cls._ready_hosts:
+            return None
+
+        host = min(cls._ready_hosts, key=lambda ready_host: cls._host_tasks[ready_host][0][:2])
+        host_tasks = cls._host_tasks[host]
+        task = heapq.heappop(host_tasks)[2]
+        if not host_tasks:
+            del cls._host_tasks[host]
+
+        cls._queued_count -= 1
+        cls._host_downloads[host] = cls._host_downloads.get(host, 0) + 1
+        cls.update_ready_host(host)
+        CrawlMetrics.set_gauge('image_download_queue', cls._queued_count)
+
+        return task
+
+    @classmethod
+    def run_worker(cls):
+        while True:
+            with cls._condition:
+                task = None
+                while not cls._is_stopped:
+                    task = cls.take_task()
+                    if task is not None:
+                        break
+                    cls._condition.wait()
+
+                if task is None:
+                    return
+
+            full_path = None
+            try:
+                full_path = task['download']()
+            except Exception as e:
+                logging.error(f"Error downloading {task['img_url']}: {e}")
+            finally:
+                with cls._condition:
+                    cls._host_downloads[task['host']] -= 1
+                    url_tasks = cls._tasks_by_url.pop(task['img_url'])
+                    cls.update_ready_host(task['host'])
+                    # One connection of the host is free, so one waiting worker is enough to take the next task.
+                    cls._condition.notify()
+
+            cls.set_future_result(task['future'], full_path)
+
+            for url_task in url_tasks[1:]:
+                if not url_task['future'].cancelled():
+                    cls.set_future_result(url_task['future'], cls.place_downloaded_image(url_task, full_path))
+
+    @staticmethod
+    def set_future_result(future: Future, result):
+        # A future cancelled by shutdown or by its caller no longer takes a result.
+        if not future.cancelled():
+            future.set_result(result)
+
+    @staticmethod
+    def place_downloaded_image(task: dict, downloaded_path: str):
+        if downloaded_path is None:
+            return None
+
+        image_store = task['image_store']
+        temp_path = ImageFileWriter.create_temp_file_path(task['full_path'])
+
+        try:
+            if image_store is not None and image_store.link_existing_object(task['img_url'], task['full_path']):
+                logging.info(f"Linked {task['img_url']} as {task['full_path']}")
+                return task['full_path']
+
+            shutil.copyfile(downloaded_path, temp_path)
+            os.replace(temp_path, task['full_path'])
+        except OSError as e:
+            logging.error(f"Failed to copy {downloaded_path} to {task['full_path']}: {e}")
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return None
+
+        logging.info(f"Copied {task['img_url']} as {task['full_path']}")
+        return task['full_path']
@@ -0,0 +1,70 @@
+import os
+import time
+import hashlib
+import uuid
+from Class.CrawlMetrics import CrawlMetrics
+from Class.ImageStore import ImageStore
+
+
+class ImageFileWriter:
+    def __init__(self, img_url: str, full_path: str, image_store: ImageStore = None):
+        self.img_url = img_url
+        self.full_path = full_path
+        self.image_store = image_store
+        self.temp_path = image_store.create_temp_file_path() if image_store is not None \
+            else self.create_temp_file_path(full_path)
+        self.content_hash = hashlib.sha256() if image_store is not None else None
+        self.written_size = 0
+        self.write_seconds = 0.0
+        self.file = None
+
+    def __enter__(self):
+        self.file = open(self.temp_path, 'wb')
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if not self.file.closed:
+            self.file.close()
+
+        if os.path.exists(self.temp_path):
+            os.remove(self.temp_path)
+
+    @staticmethod
+    def create_temp_file_path(full_path):
+        directory, file_name = os.path.split(full_path)
+        return os.path.join(directory, f".{file_name}.{uuid.uuid4().hex[:8]}.part")
+
+    def write(self, chunk: bytes):
+        started_at = time.perf_counter()
+        self.file.write(chunk)
+        self.write_seconds += time.perf_counter() - started_at
+        self.written_size += len(chunk)
+
+        if self.content_hash is not None:
+            self.content_hash.update(chunk)
+
+    def is_complete(self, headers) -> bool:
+        content_length = headers.get('Content-Length')
+        content_encoding = headers.get('Content-Encoding', 'identity')
+
+        return content_length is None or content_encoding != 'identity' or int(content_length) == self.written_size
+
+    def commit(self, headers) -> bool:
+        # Chunks are written while the response streams in, so their write time is added to the commit time.
+        started_at = time.perf_counter()
+        try:
+            self.file.close()
+
+            if not self.is_complete(headers):
+                return False
+
+            if self.image_store is None:
+                os.replace(self.temp_path, self.full_path)
+            else:
+                object_path = self.image_store.add_object(self.temp_path, self.img_url, self.content_hash.hexdigest())
+                self.image_store.link_object(object_path, self.full_path)
+
+            return True
+        finally:
+            CrawlMetrics.observe('stage_seconds', self.write_seconds + time.perf_counter() - started_at,
+                                 stage=CrawlMetrics.STAGE_DISK_WRITE)
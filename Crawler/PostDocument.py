@@ -0,0 +1,219 @@
+import re
+import json
+import html
+import requests
+from bs4 import BeautifulSoup
+from Class.LoggingConfig import logging
+from Class.HttpClient import HttpClient
+from Class.CrawlMetrics import CrawlMetrics
+from Class.ResponseCache import ResponseCache
+from urllib.parse import urlparse, urlunparse, urljoin
+
+try:
+    import lxml.html
+    import lxml.etree
+except ImportError:
+    lxml = None
+
+
+class PostDocument:
+    POST_BASE_URL = "https://m.blog.naver.com"
+    POST_HOSTS = ('blog.naver.com', 'm.blog.naver.com')
+    IMG_BASE_URL = "https://blogfiles.pstatic.net"
+
+    PHOTO_VIEW_TAG_PATTERN = re.compile(rb'<div\b[^>]*\bid\s*=\s*["\']_photo_view_property["\'][^>]*>', re.IGNORECASE)
+    ATTACH_IMAGE_INFO_PATTERN = re.compile(rb'\battachimagepathandidinfo\s*=\s*(?:"([^"]*)"|\'([^\']*)\')',
+                                           re.IGNORECASE)
+    MAIN_CONTAINER_TAG_PATTERN = re.compile(
+        rb'<div\b[^>]*\bclass\s*=\s*["\'][^"\']*(?<![\w-])se-main-container(?![\w-])[^"\']*["\'][^>]*>',
+        re.IGNORECASE)
+    # Comments and script/style bodies are matched as a whole so that div tags inside them are not counted. An
+    # unterminated one runs to the end of the page, and the scan falls back to BeautifulSoup.
+    DIV_TAG_PATTERN = re.compile(
+        rb'(?P<skipped><!--.*?(?:-->|\Z)|<(?P<raw_tag>script|style)\b[^>]*>.*?(?:</(?P=raw_tag)\s*>|\Z))'
+        rb'|<(?P<close>/?)div\b[^>]*>',
+        re.IGNORECASE | re.DOTALL)
+
+    # Mirror BeautifulSoup get_text(): strings of these tags are not text, and whitespace-only strings are
+    # collapsed to a single '\n' or ' ' outside of whitespace-preserving tags.
+    IGNORED_TEXT_TAGS = frozenset(['script', 'style', 'template', 'rt', 'rp'])
+    PRESERVE_WHITESPACE_TAGS = frozenset(['pre', 'textarea'])
+    ASCII_SPACES = '\x20\x0a\x09\x0c\x0d'
+
+    def __init__(self, post_url: str, content: bytes = None):
+        self.post_url = self.adjust_post_url(post_url)
+        self.all_img_urls = []
+        self.post_text = ""
+        self.is_fetched = False
+
+        logging.info(f"Init PostDocument (post_url: {self.post_url})")
+
+        if content is None:
+            self.fetch_post_document()
+        else:
+            self.parse_post_document(content)
+
+    def get_all_img_urls(self):
+        return self.all_img_urls
+
+    def get_post_text(self):
+        return self.post_text
+
+    @classmethod
+    def adjust_post_url(cls, url):
+        # Naver blog posts are fetched from POST_BASE_URL (the mobile site by default); other URLs are kept.
+        parsed_url = urlparse(url)
+        if parsed_url.netloc not in cls.POST_HOSTS:
+            return url
+
+        post_base_url = urlparse(cls.POST_BASE_URL)
+        return urlunparse(parsed_url._replace(scheme=post_base_url.scheme, netloc=post_base_url.netloc))
+
+    def fetch_post_document(self):
+        try:
+            with CrawlMetrics.measure_stage(CrawlMetrics.STAGE_POST_FETCH):
+                response = HttpClient.get(self.post_url, cache_endpoint=ResponseCache.ENDPOINT_POST,
+                                          host_class=HttpClient.HOST_CLASS_POST)
+            if response.status_code == 200:
+                self.parse_post_document(response.content)
+            else:
+                logging.error(f"Failed to access {self.post_url} - HTTP Status Code: {response.status_code}")
+        except requests.RequestException as e:
+            logging.error(f"Error while getting post document: {e}")
+
+    def parse_post_document(self, content: bytes):
+        self.is_fetched = True
+
+        with CrawlMetrics.measure_stage(CrawlMetrics.STAGE_PARSE):
+            all_img_urls = self.scan_img_urls(content)
+            post_text = self.scan_post_text(content)
+
+            if all_img_urls is None or post_text is None:
+                logging.debug(f"Fall back to BeautifulSoup (post_url: {self.post_url})")
+                CrawlMetrics.increment('parse_fallbacks_total')
+                self.parse_post_document_soup(content)
+                return
+
+        self.all_img_urls = all_img_urls
+        self.post_text = post_text
+
+    def parse_post_document_soup(self, content: bytes):
+        self.is_fetched = True
+        soup = BeautifulSoup(content, 'html.parser')
+        self.all_img_urls = self.extract_img_urls(soup)
+        self.post_text = self.extract_post_text(soup)
+
+    def scan_img_urls(self, content: bytes):
+        # Returns None when the markup is not recognized so that the caller falls back to BeautifulSoup.
+        photo_view_tag = self.PHOTO_VIEW_TAG_PATTERN.search(content)
+        if not photo_view_tag:
+            return None if b'_photo_view_property' in content else []
+
+        # The tag pattern ends at the first '>', so an attribute value containing one cuts the tag short. A tag
+        # without image urls is checked by BeautifulSoup rather than saved as a post without images.
+        attach_image_info = self.ATTACH_IMAGE_INFO_PATTERN.search(photo_view_tag.group(0))
+        if not attach_image_info:
+            return None
+
+        raw_info = attach_image_info.group(1) if attach_image_info.group(1) is not None else attach_image_info.group(2)
+
+        return self.parse_attach_image_info(html.unescape(raw_info.decode('utf-8', errors='replace'))) or None
+
+    def extract_img_urls(self, soup):
+        file_box = soup.find('div', id='_photo_view_property')
+        if file_box and file_box.has_attr('attachimagepathandidinfo'):
+            return self.parse_attach_image_info(file_box['attachimagepathandidinfo'])
+
+        return []
+
+    def parse_attach_image_info(self, attach_image_info: str):
+        try:
+            file_info = json.loads(attach_image_info)
+        except ValueError:
+            file_info = None
+
+        if isinstance(file_info, list):
+            img_urls = [urljoin(self.IMG_BASE_URL, info['path']) if info['path'] else None
+                        for info in file_info if isinstance(info, dict) and 'path' in info]
+        else:
+            img_urls = [self.extract_url_from_info(info)
+                        for info in attach_image_info.strip("[]").split('},{') if '"path"' in info]
+
+        valid_img_urls = []
+        for img_url in img_urls:
+            if img_url and self.is_valid_url(img_url):
+                valid_img_urls.append(img_url)
+            else:
+                logging.warning(f"Invalid URL skipped: {img_url}")
+
+        return valid_img_urls
+
+    @staticmethod
+    def extract_url_from_info(info):
+        path_start = info.find('"path":') + len('"path":')
+        path_end = info.find(',', path_start) if ',' in info else len(info)
+        img_path = info[path_start:path_end].strip('"')
+
+        return urljoin(PostDocument.IMG_BASE_URL, img_path) if img_path else None
+
+    @staticmethod
+    def is_valid_url(url):
+        result = urlparse(url)
+        return all([result.scheme, result.netloc])
+
+    def scan_post_text(self, content: bytes):
+        # Cuts the se-main-container element out of the page by counting div tags and parses only that fragment.
+        main_container_tag = self.MAIN_CONTAINER_TAG_PATTERN.search(content)
+        if not main_container_tag:
+            return None if b'se-main-container' in content else ""
+
+        depth = 1
+        for div_tag in self.DIV_TAG_PATTERN.finditer(content, main_container_tag.end()):
+            if div_tag.group('skipped'):
+                continue
+
+            depth += -1 if div_tag.group('close') else 1
+            if depth == 0:
+                return self.extract_fragment_text(content[main_container_tag.start():div_tag.end()])
+
+        return None
+
+    def extract_fragment_text(self, fragment: bytes):
+        if lxml is None:
+            return self.extract_post_text(BeautifulSoup(fragment, 'html.parser'))
+
+        try:
+            element = lxml.html.fragment_fromstring(fragment.decode('utf-8', errors='replace'))
+        except (lxml.etree.ParserError, ValueError):
+            return None
+
+        strings = []
+        self.collect_element_strings(element, strings, preserve_whitespace=False)
+
+        return '\n'.join(strings)
+
+    def collect_element_strings(self, element, strings: list, preserve_whitespace: bool):
+        preserve_whitespace = preserve_whitespace or element.tag in self.PRESERVE_WHITESPACE_TAGS
+        self.add_text_string(element.text, strings, preserve_whitespace)
+
+        for child in element:
+            if isinstance(child.tag, str) and child.tag not in self.IGNORED_TEXT_TAGS:
+                self.collect_element_strings(child, strings, preserve_whitespace)
+            self.add_text_string(child.tail, strings, preserve_whitespace)
+
+    def add_text_string(self, text: str, strings: list, preserve_whitespace: bool):
+        if not text:
+            return
+
+        if not preserve_whitespace and not text.strip(self.ASCII_SPACES):
+            text = '\n' if '\n' in text else ' '
+
+        strings.append(text)
+
+    @staticmethod
+    def extract_post_text(soup):
+        post_content = soup.find('div', class_='se-main-container')
+        if post_content:
+            return post_content.get_text(separator='\n')
+
+        return ""
@@ -0,0 +1,15 @@
+from Crawler.PostDocument import PostDocument
+
+
+class PostDocumentCrawler:
+    # Base of the crawlers that read one post page, given as a PostDocument or fetched from post_url.
+    def __init__(self, post_url: str, post_document: PostDocument = None):
+        self._post_document = post_document
+        self.post_url = post_document.post_url if post_document is not None else PostDocument.adjust_post_url(post_url)
+
+    @property
+    def post_document(self) -> PostDocument:
+        # The post page is fetched on first use, not when the crawler is created.
+        if self._post_document is None:
+            self._post_document = PostDocument(post_url=self.post_url)
+        return self._post_document
@@ -1,83 +1,105 @@
 import os
-import requests
-from bs4 import BeautifulSoup
+from concurrent.futures import Future
+from functools import partial
 from Class.LoggingConfig import logging
-from urllib.parse import urlparse, urljoin
+from Class.HttpClient import HttpClient
+from Class.CrawlMetrics import CrawlMetrics
+from Class.ImageStore import ImageStore
+from Crawler.ImageFileWriter import ImageFileWriter
+from Crawler.ImageDownloadScheduler import ImageDownloadScheduler
+from Crawler.PostDocument import PostDocument
+from Crawler.PostDocumentCrawler import PostDocumentCrawler
+from urllib.parse import urlparse
 
 
-class PostImageCrawler:
-    def __init__(self, post_url: str):
-        self.post_url = self.adjust_post_url(post_url)
-        self.all_img_urls = []
+class PostImageCrawler(PostDocumentCrawler):
+    CHUNK_SIZE = 64 * 1024
 
-        logging.info(f"Init PostImageCrawler (post_url: {self.post_url})")
+    def __init__(self, post_url: str, post_document: PostDocument = None, image_store: ImageStore = None):
+        super().__init__(post_url, post_document=post_document)
+        self.image_store = image_store
 
-        self.fetch_all_img_urls()
+        logging.info(f"Init PostImageCrawler (post_url: {self.post_url})")
 
     def get_all_img_urls(self):
-        return self.all_img_urls
+        return self.post_document.get_all_img_urls()
 
     def get_all_img_urls_len(self):
-        return len(self.all_img_urls)
+        return len(self.get_all_img_urls())
 
-    @staticmethod
-    def adjust_post_url(url):
-        return url.replace("blog.naver.com", "m.blog.naver.com") if "m.blog.naver.com" not in url else url
+    def iter_image_urls(self):
+        yield from self.get_all_img_urls()
 
-    def fetch_all_img_urls(self):
-        try:
-            response = requests.get(self.post_url)
-            if response.status_code == 200:
-                soup = BeautifulSoup(response.content, 'html.parser')
-                self.extract_img_urls(soup)
-            else:
-                logging.error(f"Failed to access {self.post_url}")
-        except requests.RequestException as e:
-            logging.error(f"Error while getting all image URLs: {e}")
-
-    def extract_img_urls(self, soup):
-        file_box = soup.find('div', id='_photo_view_property')
-        if file_box:
-            file_info = file_box['attachimagepathandidinfo'].strip("[]").split('},{')
-            for info in file_info:
-                if '"path"' in info:
-                    img_url = self.extract_url_from_info(info)
-                    if img_url and self.is_valid_url(img_url):
-                        self.all_img_urls.append(img_url)
-                    else:
-                        logging.warning(f"Invalid URL skipped: {img_url}")
+    def iter_downloaded_images(self, path: str, priority: tuple = ()):
+        # Yields (img_url, full_path) as soon as each image is saved; failed images are logged and skipped.
+        if ImageDownloadScheduler.is_enabled():
+            # All images of the post are queued at once and downloaded by the threads of the scheduler.
+            img_futures = [(img_url, self.submit_img(img_url, path, image_store=self.image_store, priority=priority))
+                           for img_url in self.iter_image_urls()]
+        else:
+            img_futures = ((img_url, self.submit_img(img_url, path, image_store=self.image_store))
+                           for img_url in self.iter_image_urls())
 
-    @staticmethod
-    def extract_url_from_info(info):
-        path_start = info.find('"path":') + len('"path":')
-        path_end = info.find(',', path_start) if ',' in info else len(info)
-        img_path = info[path_start:path_end].strip('"')
+        for img_url, img_future in img_futures:
+            try:
+                full_path = img_future.result()
+                if full_path is not None:
+                    yield img_url, full_path
+            except Exception as e:
+                logging.error(f"Error downloading {img_url}: {e}")
 
-        return urljoin("https://blogfiles.pstatic.net", img_path) if img_path else None
+    def download_all_img(self, path: str, priority: tuple = ()):
+        return list(self.iter_downloaded_images(path, priority=priority))
 
     @staticmethod
-    def is_valid_url(url):
-        result = urlparse(url)
-        return all([result.scheme, result.netloc])
+    def get_img_full_path(img_url, path):
+        return os.path.join(path, os.path.basename(urlparse(img_url).path))
 
-    def download_all_img(self, path: str):
-        for img_url in self.all_img_urls:
-            try:
-                self.download_img(img_url, path)
-            except Exception as e:
-                logging.error(f"Error downloading {img_url}: {e}")
+    @staticmethod
+    def submit_img(img_url, path, image_store: ImageStore = None, priority: tuple = ()) -> Future:
+        # Without the scheduler, the image is downloaded right away in the calling thread.
+        download = partial(PostImageCrawler.download_img, img_url, path, image_store=image_store)
+
+        if ImageDownloadScheduler.is_enabled():
+            return ImageDownloadScheduler.submit(img_url, PostImageCrawler.get_img_full_path(img_url, path), download,
+                                                 priority=priority, image_store=image_store)
+
+        img_future = Future()
+        try:
+            img_future.set_result(download())
+        except Exception as e:
+            img_future.set_exception(e)
+
+        return img_future
 
     @staticmethod
-    def download_img(img_url, path):
-        file_name = os.path.basename(urlparse(img_url).path)
-        full_path = os.path.join(path, file_name)
-        if not os.path.exists(full_path):
-            response = requests.get(img_url)
-            if response.status_code == 200:
-                with open(full_path, 'wb') as file:
-                    file.write(response.content)
-                logging.info(f"Downloaded {img_url} as {full_path}")
-            else:
-                logging.error(f"Failed to download {img_url} - HTTP Status Code: {response.status_code}")
-        else:
+    def download_img(img_url, path, image_store: ImageStore = None):
+        full_path = PostImageCrawler.get_img_full_path(img_url, path)
+        if os.path.exists(full_path):
             logging.debug(f"File already exists: {full_path}")
+            return full_path
+
+        if image_store is not None and image_store.link_existing_object(img_url, full_path):
+            logging.info(f"Linked {img_url} as {full_path}")
+            return full_path
+
+        with CrawlMetrics.measure_stage(CrawlMetrics.STAGE_IMAGE_DOWNLOAD), \
+                HttpClient.get(img_url, host_class=HttpClient.HOST_CLASS_IMAGE, stream=True) as response:
+            if response.status_code != 200:
+                logging.error(f"Failed to download {img_url} - HTTP Status Code: {response.status_code}")
+                return None
+
+            with ImageFileWriter(img_url, full_path, image_store=image_store) as writer:
+                for chunk in response.iter_content(chunk_size=PostImageCrawler.CHUNK_SIZE):
+                    writer.write(chunk)
+                    ImageDownloadScheduler.limit_bandwidth(len(chunk))
+
+                CrawlMetrics.record_downloaded_bytes(img_url, writer.written_size)
+
+                if writer.commit(response.headers):
+                    logging.info(f"Downloaded {img_url} as {full_path}")
+                    return full_path
+
+                logging.error(f"Failed to download {img_url} - Incomplete content "
+                              f"({writer.written_size} of {response.headers.get('Content-Length')} bytes)")
+                return None
@@ -1,89 +1,251 @@
-import requests
 import json
-from datetime import date, datetime, timedelta
+import requests
+from datetime import date
 from Class.LoggingConfig import logging
+from Class.HttpClient import HttpClient
+from Class.CrawlMetrics import CrawlMetrics
+from Class.ResponseCache import ResponseCache
+from Class.Post import Post
+from Class.PostIndex import PostIndex
 
 
 class PostSearchCrawler:
+    SEARCH_URL = "https://section.blog.naver.com/ajax/SearchList.naver"
+
     def __init__(self,
                  keyword: str,
                  search_date: date,
                  count_per_page: int = 10,
                  order_by_sim: bool = False,
-                 max_search_page: int = 1
+                 max_search_page: int = 1,
+                 start_date: date = None,
+                 end_date: date = None
                  ):
         self.keyword = keyword
         self.search_date = search_date
         self.count_per_page = count_per_page
         self.order_by_sim = order_by_sim
         self.max_search_page = max_search_page
-        self.result_all_posts = []
+        self.start_date = start_date
+        self.end_date = end_date
+        self.result_post_index = PostIndex()
+        self.result_posts_by_date = {}
+        self.page_posts_cache = {}
+        self.collected_post_keys = set()
+        self.collected_posts = []
+        self.is_failed = False
 
         logging.info("")
-        logging.info(f"Init PostSearchCrawler (keyword: {self.keyword}, search_date: {self.search_date})")
-
-        if not order_by_sim and search_date:
-            self.fetch_posts_by_date()
-        elif order_by_sim:
-            self.fetch_posts_by_date_sim()
+        if self.is_date_range():
+            logging.info(f"Init PostSearchCrawler (keyword: {self.keyword}, "
+                         f"start_date: {self.start_date}, end_date: {self.end_date})")
+        else:
+            logging.info(f"Init PostSearchCrawler (keyword: {self.keyword}, search_date: {self.search_date})")
 
     def get_result_all_posts(self):
-        return self.result_all_posts
+        return self.result_post_index.get_posts()
 
-    def fetch_posts_by_date(self):
-        page = 1
+    def get_result_posts_by_date(self):
+        return self.result_posts_by_date
+
+    def is_date_range(self):
+        return self.start_date is not None and self.end_date is not None
+
+    def get_order_by(self):
+        return 'sim' if self.order_by_sim else 'recentdate'
+
+    def get_page_collector(self):
+        if self.order_by_sim:
+            return self.collect_posts_by_date_sim
+        elif self.is_date_range():
+            return self.collect_posts_by_date_range
+        elif self.search_date:
+            return self.collect_posts_by_date
+
+        return None
+
+    def is_page_in_range(self, page: int):
+        return self.max_search_page is None or page <= self.max_search_page
+
+    def add_post(self, post) -> bool:
+        # The posts are handed on by take_collected_posts; only their keys stay for the rest of the search, one short
+        # string per search hit.
+        if post.post_key in self.collected_post_keys:
+            return False
+
+        post.keywords = [self.keyword]
+        self.collected_post_keys.add(post.post_key)
+        self.collected_posts.append(post)
+        return True
+
+    def take_collected_posts(self) -> list:
+        collected_posts = self.collected_posts
+        self.collected_posts = []
+        return collected_posts
+
+    def store_post(self, post):
+        if self.result_post_index.add(post) and self.is_date_range():
+            self.result_posts_by_date.setdefault(post.add_date.date(), []).append(post)
+
+    def fetch_posts(self):
+        for post in self.iter_search_results():
+            self.store_post(post)
+
+    def iter_search_results(self):
+        for page_posts in self.iter_search_pages():
+            yield from page_posts
+
+    def iter_search_pages(self):
+        # Yields the new posts of every search page as soon as the page is fetched, so they can be processed while
+        # the search goes on.
+        collect_page_posts = self.get_page_collector()
+        if collect_page_posts is None:
+            return
+
+        page = self.run_seek_first_page() if self.is_seekable() else 1
+
+        try:
+            while self.is_page_in_range(page):
+                response_list = self.get_page_posts(page)
+                if response_list is None:
+                    break
+
+                is_continued = collect_page_posts(response_list)
+                yield self.take_collected_posts()
+
+                if not is_continued:
+                    break
+
+                page += 1
+        finally:
+            self.page_posts_cache.clear()
+
+    def get_page_posts(self, page: int):
+        if page in self.page_posts_cache:
+            return self.page_posts_cache.pop(page)
+
+        logging.info(f"Get Response (keyword: {self.keyword}, page: {page}, count_per_page: {self.count_per_page})")
+        with CrawlMetrics.measure_stage(CrawlMetrics.STAGE_SEARCH):
+            try:
+                response = self.get_response(keyword=self.keyword, order_by=self.get_order_by(), page=page,
+                                             count_per_page=self.count_per_page)
+            except requests.RequestException as e:
+                logging.error(f"Error while getting search page {page} of {self.keyword}: {e}")
+                return self.fail_page()
+
+            if response.status_code != 200:
+                logging.error(f"Failed to access search page {page} of {self.keyword} "
+                              f"- HTTP Status Code: {response.status_code}")
+                return self.fail_page()
 
-        while self.max_search_page is None or page <= self.max_search_page:
-            logging.info(f"Get Response (keyword: {self.keyword}, page: {page}, count_per_page: {self.count_per_page})")
-            response = self.get_response(keyword=self.keyword, order_by='recentdate', page=page,
-                                         count_per_page=self.count_per_page)
             response_json = self.convert_response_to_json(response=response)
-            response_list = self.convert_json_to_list(response_json=response_json)
+            if response_json is None:
+                return self.fail_page()
+
+            return self.convert_json_to_list(response_json=response_json)
+
+    def fail_page(self):
+        # Like the async engine, the search stops at a page that can not be fetched and keeps the posts found so far.
+        self.is_failed = True
+        return None
+
+    def is_seekable(self):
+        return not self.order_by_sim and (self.is_date_range() or self.search_date is not None)
 
-            if not response_list:
-                break
+    def get_seek_target_date(self):
+        return self.end_date if self.is_date_range() else self.search_date
+
+    def run_seek_first_page(self):
+        seek = self.seek_first_page()
+        page = next(seek)
+
+        try:
+            while True:
+                if page not in self.page_posts_cache:
+                    self.page_posts_cache[page] = self.get_page_posts(page)
+                if self.page_posts_cache[page] is None:
+                    return page
+                page = seek.send(self.page_posts_cache[page])
+        except StopIteration as stop:
+            return stop.value
 
-            for post in response_list:
-                addDate = post.get('addDate')
-                if addDate:
-                    addDate = addDate.date()
-                    if addDate == self.search_date and post not in self.result_all_posts:
-                        self.result_all_posts.append(post)
-                    elif addDate < self.search_date:
-                        return
+    def seek_first_page(self):
+        # Generator that yields pages to probe and receives their posts, shared by the sync and async engines.
+        # The recentdate feed is newest first: probe pages 1, 2, 4, ... then binary search the last gap.
+        target_date = self.get_seek_target_date()
 
-            page += 1
+        def is_page_reaching_target(posts):
+            return not posts or posts[-1].add_date.date() <= target_date
 
-    def fetch_posts_by_date_sim(self):
+        newer_page = 0
         page = 1
 
-        while page <= self.max_search_page:
-            logging.info(f"Get Response (keyword: {self.keyword}, page: {page}, count_per_page: {self.count_per_page})")
-            response = self.get_response(keyword=self.keyword, order_by="sim", page=page,
-                                         count_per_page=self.count_per_page)
-            response_json = self.convert_response_to_json(response=response)
-            response_list = self.convert_json_to_list(response_json=response_json)
+        while not is_page_reaching_target((yield page)):
+            newer_page = page
+            if not self.is_page_in_range(page + 1):
+                return page + 1
+            page = page * 2 if self.max_search_page is None else min(page * 2, self.max_search_page)
+
+        while page - newer_page > 1:
+            middle_page = (newer_page + page) // 2
+            if is_page_reaching_target((yield middle_page)):
+                page = middle_page
+            else:
+                newer_page = middle_page
+
+        if page > 1:
+            logging.info(f"Seek First Page (keyword: {self.keyword}, target_date: {target_date}, page: {page})")
+
+        return page
+
+    def collect_posts_by_date(self, response_list) -> bool:
+        if not response_list:
+            return False
 
-            for post in response_list:
-                addDate = post.get('addDate')
-                if addDate:
-                    addDate = addDate.date()
+        for post in response_list:
+            addDate = post.add_date
+            if addDate:
+                addDate = addDate.date()
+                if addDate == self.search_date:
+                    self.add_post(post)
+                elif addDate < self.search_date:
+                    return False
 
-                    if self.search_date is not None and addDate == self.search_date and post not in self.result_all_posts:
-                        self.result_all_posts.append(post)
+        return True
 
-                    elif self.search_date is None and post not in self.result_all_posts:
-                        self.result_all_posts.append(post)
+    def collect_posts_by_date_range(self, response_list) -> bool:
+        if not response_list:
+            return False
 
-            if page == self.max_search_page:
-                break
+        for post in response_list:
+            addDate = post.add_date
+            if addDate:
+                addDate = addDate.date()
+                if addDate < self.start_date:
+                    return False
+                elif addDate <= self.end_date:
+                    self.add_post(post)
 
-            page += 1
+        return True
+
+    def collect_posts_by_date_sim(self, response_list) -> bool:
+        for post in response_list:
+            addDate = post.add_date
+            if addDate:
+                addDate = addDate.date()
+
+                if self.is_date_range():
+                    if self.start_date <= addDate <= self.end_date:
+                        self.add_post(post)
+
+                elif self.search_date is None or addDate == self.search_date:
+                    self.add_post(post)
+
+        return True
 
     @staticmethod
-    def get_response(keyword, order_by='recentdate', page=1, count_per_page=7):
-        base_url = "https://section.blog.naver.com/ajax/SearchList.naver"
-        params = {
+    def get_request_params(keyword, order_by='recentdate', page=1, count_per_page=7):
+        return {
             'countPerPage': count_per_page,
             'currentPage': page,
             'endDate': '',
@@ -92,27 +254,23 @@ class PostSearchCrawler:
             'startDate': '',
             'type': 'post'
         }
-        headers = {
-            'Accept': 'application/json, text/plain, */*',
-            'Accept-Encoding': 'gzip, deflate, br',
-            'Accept-Language': 'ko-KR,ko;q=0.9',
-            'Referer': 'https://section.blog.naver.com/Search/Post.naver',
-            'Sec-Ch-Ua': '"Chromium";v="122", "Google Chrome";v="122", ";Not A Brand";v="99"',
-            'Sec-Ch-Ua-Mobile': '?0',
-            'Sec-Ch-Ua-Platform': '"Windows"',
-            'Sec-Fetch-Dest': 'empty',
-            'Sec-Fetch-Mode': 'cors',
-            'Sec-Fetch-Site': 'same-origin',
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36',
-        }
 
-        response = requests.get(base_url, headers=headers, params=params)
+    @staticmethod
+    def get_response(keyword, order_by='recentdate', page=1, count_per_page=7):
+        params = PostSearchCrawler.get_request_params(keyword=keyword, order_by=order_by, page=page,
+                                                      count_per_page=count_per_page)
+
+        response = HttpClient.get(PostSearchCrawler.SEARCH_URL, headers=HttpClient.SEARCH_HEADERS, params=params,
+                                  cache_endpoint=ResponseCache.ENDPOINT_SEARCH, host_class=HttpClient.HOST_CLASS_SEARCH)
 
         return response
 
     @staticmethod
     def convert_response_to_json(response):
-        response_text = response.text
+        return PostSearchCrawler.convert_text_to_json(response.text)
+
+    @staticmethod
+    def convert_text_to_json(response_text):
         response_json = None
 
         json_start_pos = response_text.find('{')
@@ -130,25 +288,4 @@ class PostSearchCrawler:
 
     @staticmethod
     def convert_json_to_list(response_json):
-        result = []
-
-        for item in response_json['result']['searchList']:
-            addDate = datetime.utcfromtimestamp(item['addDate'] / 1000) + timedelta(hours=9)
-            thumbnails_urls = [thumb['url'] for thumb in item['thumbnails']]
-            item_dict = {
-                'postUrl': item['postUrl'],
-                'title': item['title'],
-                'contents': item['contents'],
-                'nickName': item.get('nickName', ''),
-                'blogName': item.get('blogName', ''),
-                'addDate': addDate,
-                'thumbnails': thumbnails_urls,
-                'product': item.get('product', None),
-                'hasThumbnail': item.get('hasThumbnail', False),
-                'marketPost': item.get('marketPost', False)
-            }
-
-            result.append(item_dict)
-
-        return result
-
+        return [Post.from_search_item(item) for item in response_json['result']['searchList']]
@@ -1,10 +1,25 @@
 import os
+import signal
+import socket
 import argparse
 import json
+import multiprocessing
 from datetime import date, timedelta
 
-from Class.LoggingConfig import logging
+from Class.LoggingConfig import LoggingConfig, logging
+from Class.HttpClient import HttpClient
+from Class.CrawlMetrics import CrawlMetrics
+from Class.ImageStore import ImageStore
+from Class.ResponseCache import ResponseCache
+from Class.CrawlState import CrawlState
+from Class.JobQueue import JobQueue
+from Class.PostFilter import PostFilter
+from Crawler.PostSearchCrawler import PostSearchCrawler
+from Crawler.PostDocument import PostDocument
+from Crawler.ImageDownloadScheduler import ImageDownloadScheduler
+from Class.CrawlDaemon import CrawlDaemon
 from Class.Subject import Subject
+from Crawler.AsyncCrawlEngine import AsyncCrawlEngine
 
 
 def parse_arguments():
@@ -25,6 +40,41 @@ def parse_arguments():
     parser.add_argument("--count_per_page", type=int, default=10, help="Count Per Page for Search")
     parser.add_argument("--max_search_page", type=int, help="Max Search Page for Search Order by Similar")
     parser.add_argument("--min_image_count", type=int, default=2, help="Min Image Count for Search")
+    parser.add_argument("--skip_market_posts", action='store_true', default=False, help="Skip market posts from their search result before fetching the post page")
+    parser.add_argument("--require_thumbnail", action='store_true', default=False, help="Skip posts without thumbnails in their search result before fetching the post page")
+    parser.add_argument("--require_keyword_hint", action='store_true', default=False, help="Skip posts whose search result title and snippet do not include a keyword before fetching the post page")
+    parser.add_argument("--workers", type=int, default=1, help="Number of posts processed concurrently")
+    parser.add_argument("--engine", type=str, choices=['sync', 'async'], default='sync', help="Crawling engine (sync: requests, async: aiohttp)")
+    parser.add_argument("--search_workers", type=int, default=1, help="Number of (subject, keyword) searches run concurrently")
+    parser.add_argument("--rate_limit", type=float, default=None, help="Global request rate limit in requests per second")
+    parser.add_argument("--connections_per_host", type=int, default=8, help="Max concurrent connections per host")
+    parser.add_argument("--adaptive_concurrency", action='store_true', default=False, help="Adapt the concurrent requests per host class (search, post, image) to the latency and throttling of Naver, up to --connections_per_host")
+    parser.add_argument("--image_download_workers", type=int, default=0, help="Threads of the process-wide image download scheduler (0: images are downloaded by the post workers)")
+    parser.add_argument("--image_connections_per_host", type=int, default=4, help="Max concurrent image downloads per host with the image download scheduler")
+    parser.add_argument("--image_bandwidth", type=float, default=None, help="Total image download bandwidth limit in MiB/s")
+    parser.add_argument("--image_store", action='store_true', default=False, help="Store images once in a content-addressed store under the output directory and link them into post directories")
+    parser.add_argument("--image_store_link", type=str, choices=ImageStore.LINK_MODES, default='hardlink', help="How post directories reference images in the image store")
+    parser.add_argument("--max_post_retries", type=int, default=3, help="Max runs that retry a post whose page or images failed to download")
+    parser.add_argument("--response_cache", action='store_true', default=False, help="Cache search and post page responses under the output directory and revalidate them with ETag/Last-Modified")
+    parser.add_argument("--search_cache_ttl", type=int, default=ResponseCache.DEFAULT_TTLS[ResponseCache.ENDPOINT_SEARCH], help="Seconds a cached search page is used without revalidation")
+    parser.add_argument("--post_cache_ttl", type=int, default=ResponseCache.DEFAULT_TTLS[ResponseCache.ENDPOINT_POST], help="Seconds a cached post page is used without revalidation")
+    parser.add_argument("--daemon", action='store_true', default=False, help="Keep running and re-crawl every subject on its interval from a persistent job queue")
+    parser.add_argument("--daemon_interval", type=float, default=60, help="Default minutes between two crawls of a subject in daemon mode")
+    parser.add_argument("--processes", type=int, default=1, help="Number of daemon processes sharing the job queue (each runs --workers workers)")
+    parser.add_argument("--job_retention_hours", type=float, default=24, help="Hours to keep done and failed jobs in the daemon job queue before they are purged")
+    parser.add_argument("--recent_days", type=int, default=None, help="Search the most recent N days including today (re-evaluated on every daemon schedule)")
+    parser.add_argument("--metrics_file", type=str, default=None, help="Write crawl metrics to this file at the end of the run (every minute in daemon mode)")
+    parser.add_argument("--metrics_format", type=str, choices=CrawlMetrics.FORMATS, default=CrawlMetrics.FORMAT_PROMETHEUS, help="Format of --metrics_file (prometheus: text exposition format, jsonl: one JSON snapshot per line)")
+    parser.add_argument("--search_url", type=str, default=PostSearchCrawler.SEARCH_URL, help="Search API URL (e.g. a local mock server for benchmarks)")
+    parser.add_argument("--post_base_url", type=str, default=PostDocument.POST_BASE_URL, help="Base URL that blog.naver.com post pages are fetched from")
+    parser.add_argument("--image_base_url", type=str, default=PostDocument.IMG_BASE_URL, help="Base URL of relative image paths in post pages")
+    parser.add_argument("--log_level", type=str, choices=LoggingConfig.LOG_LEVELS, default='DEBUG', help="Lowest level of log records written to the console and the log file")
+    parser.add_argument("--log_format", type=str, choices=LoggingConfig.LOG_FORMATS, default=LoggingConfig.LOG_FORMAT_TEXT, help="Log file format (text or one JSON object per line)")
+    parser.add_argument("--log_dir", type=str, default=None, help="Log file directory (default: Logs in the working directory)")
+    parser.add_argument("--log_max_bytes", type=int, default=0, help="Rotate the log file at this size in bytes (0: no rotation)")
+    parser.add_argument("--log_backup_count", type=int, default=5, help="Rotated log files to keep")
+    parser.add_argument("--timeout", type=float, default=30, help="HTTP request timeout in seconds")
+    parser.add_argument("--max_retries", type=int, default=3, help="Max retries with backoff on connection errors and HTTP 429/5xx")
 
     args = parser.parse_args()
 
@@ -43,6 +93,63 @@ def parse_arguments():
     if args.min_image_count is not None and args.min_image_count < 1:
         parser.error("min_image_count는 1 이상이어야 합니다.")
 
+    if args.workers < 1:
+        parser.error("workers는 1 이상이어야 합니다.")
+
+    if args.search_workers < 1:
+        parser.error("search_workers는 1 이상이어야 합니다.")
+
+    if args.rate_limit is not None and args.rate_limit <= 0:
+        parser.error("rate_limit은 0보다 커야 합니다.")
+
+    if args.connections_per_host < 1:
+        parser.error("connections_per_host는 1 이상이어야 합니다.")
+
+    if args.image_download_workers < 0:
+        parser.error("image_download_workers는 0 이상이어야 합니다.")
+
+    if args.image_connections_per_host < 1:
+        parser.error("image_connections_per_host는 1 이상이어야 합니다.")
+
+    if args.image_bandwidth is not None and args.image_bandwidth <= 0:
+        parser.error("image_bandwidth는 0보다 커야 합니다.")
+
+    if args.log_max_bytes < 0 or args.log_backup_count < 0:
+        parser.error("log_max_bytes와 log_backup_count는 0 이상이어야 합니다.")
+
+    if args.timeout <= 0:
+        parser.error("timeout은 0보다 커야 합니다.")
+
+    if args.max_retries < 0:
+        parser.error("max_retries는 0 이상이어야 합니다.")
+
+    if args.max_post_retries < 0:
+        parser.error("max_post_retries는 0 이상이어야 합니다.")
+
+    if args.search_cache_ttl < 0 or args.post_cache_ttl < 0:
+        parser.error("search_cache_ttl과 post_cache_ttl은 0 이상이어야 합니다.")
+
+    if args.recent_days is not None and (args.search_date or args.start_date or args.end_date):
+        parser.error("recent_days는 search_date, start_date, end_date와 함께 사용할 수 없습니다.")
+
+    if args.recent_days is not None and args.recent_days < 1:
+        parser.error("recent_days는 1 이상이어야 합니다.")
+
+    if args.daemon_interval <= 0:
+        parser.error("daemon_interval은 0보다 커야 합니다.")
+
+    if args.processes < 1:
+        parser.error("processes는 1 이상이어야 합니다.")
+
+    if args.job_retention_hours <= 0:
+        parser.error("job_retention_hours는 0보다 커야 합니다.")
+
+    if args.processes > 1 and not args.daemon:
+        parser.error("processes는 daemon 모드에서만 사용할 수 있습니다.")
+
+    if args.daemon and args.engine == 'async':
+        parser.error("daemon 모드는 sync 엔진만 지원합니다.")
+
     if args.order_by_sim and (args.max_search_page is None or args.max_search_page < 1):
         parser.error("order_by_sim을 사용하려면 max_search_page가 1 이상이어야 합니다.")
 
@@ -54,76 +161,219 @@ def date_range(start_date, end_date):
         yield start_date + timedelta(n)
 
 
+def get_search_dates(args, today):
+    if args.search_date:
+        return [args.search_date]
+    if args.start_date and args.end_date:
+        return list(date_range(args.start_date, args.end_date))
+    if args.recent_days:
+        return list(date_range(today - timedelta(args.recent_days - 1), today))
+    return None
+
+
+def get_search_range(args, today):
+    # The recent days are searched as one date range, in a single pass per keyword like --start_date/--end_date.
+    if args.recent_days:
+        return today - timedelta(args.recent_days - 1), today
+    return args.start_date, args.end_date
+
+
 def load_subject_info(json_filepath):
     with open(json_filepath, 'r', encoding='utf-8') as file:
         return json.load(file)
 
 
+def get_subject_output_path(output_directory_path, subject, search_date):
+    if search_date:
+        formatted_date = search_date.strftime('%Y-%m-%d')
+        return str(os.path.join(output_directory_path, subject["name"], formatted_date))
+
+    today_formatted = date.today().strftime('%Y-%m-%d')
+    return str(os.path.join(output_directory_path, subject["name"], f"(INF) {today_formatted}"))
+
+
+def create_post_filter(args, subject):
+    # Options in the "prefilter" object of a subject override the command line options.
+    prefilter_config = {key: getattr(args, key) for key in PostFilter.CONFIG_KEYS}
+    prefilter_config.update(subject.get("prefilter", {}))
+
+    return PostFilter.from_config(subject["keywords"], prefilter_config, min_image_count=args.min_image_count)
+
+
+def create_subject_instance(args, subject, search_date, crawl_state, image_store=None):
+    return Subject(
+        name=subject["name"],
+        keywords=subject["keywords"],
+        search_date=search_date,
+        output_path=get_subject_output_path(args.output, subject, search_date),
+        count_per_page=args.count_per_page,
+        include_content_keyword=args.include_content_keyword,
+        order_by_sim=args.order_by_sim,
+        max_search_page=args.max_search_page,
+        min_image_count=args.min_image_count,
+        workers=args.workers,
+        image_store=image_store,
+        crawl_state=crawl_state,
+        max_post_retries=args.max_post_retries,
+        post_filter=create_post_filter(args, subject),
+        priority=subject.get("priority", 0)
+    )
+
+
+def create_subject_instances(args, subject_info, search_dates, crawl_state, image_store=None):
+    return [
+        create_subject_instance(args, subject, search_date, crawl_state, image_store=image_store)
+        for subject in subject_info
+        for search_date in (search_dates or [None])
+    ]
+
+
+def configure_base_urls(args):
+    PostSearchCrawler.SEARCH_URL = args.search_url
+    PostDocument.POST_BASE_URL = args.post_base_url
+    PostDocument.IMG_BASE_URL = args.image_base_url
+
+
+def configure_http_client(args):
+    response_cache = None
+    if args.response_cache:
+        response_cache = ResponseCache(root_path=os.path.join(args.output, ".response_cache"), ttls={
+            ResponseCache.ENDPOINT_SEARCH: args.search_cache_ttl,
+            ResponseCache.ENDPOINT_POST: args.post_cache_ttl,
+        })
+
+    HttpClient.configure(timeout=args.timeout, max_retries=args.max_retries,
+                         connections_per_host=args.connections_per_host, rate_limit=args.rate_limit,
+                         response_cache=response_cache, adaptive_concurrency=args.adaptive_concurrency)
+
+
+def configure_image_download_scheduler(args):
+    bandwidth = args.image_bandwidth * 1024 * 1024 if args.image_bandwidth else None
+    ImageDownloadScheduler.configure(workers=args.image_download_workers,
+                                     connections_per_host=args.image_connections_per_host, bandwidth=bandwidth)
+
+
+def create_image_store(args):
+    if not args.image_store:
+        return None
+
+    return ImageStore(root_path=os.path.join(args.output, ".image_store"), link_mode=args.image_store_link)
+
+
+def configure_metrics(args, is_child_process=False):
+    metrics_file = args.metrics_file
+    if metrics_file and is_child_process:
+        metrics_file_root, metrics_file_ext = os.path.splitext(metrics_file)
+        metrics_file = f"{metrics_file_root}.{os.getpid()}{metrics_file_ext}"
+
+    CrawlMetrics.configure(metrics_file=metrics_file, metrics_format=args.metrics_format)
+
+
+def run_daemon(args, log_queue=None):
+    # Every process opens its own HTTP session and SQLite connections and takes jobs from the shared queue.
+    if log_queue is not None:
+        LoggingConfig.setup_process_logging(log_queue, log_level=args.log_level)
+
+    configure_metrics(args, is_child_process=args.processes > 1)
+    configure_base_urls(args)
+    configure_http_client(args)
+    configure_image_download_scheduler(args)
+    crawl_state = CrawlState(os.path.join(args.output, "crawl_state.db"))
+    image_store = create_image_store(args)
+    job_queue = JobQueue(os.path.join(args.output, "job_queue.db"), owner=f"{socket.gethostname()}:{os.getpid()}")
+
+    CrawlDaemon(
+        subject_info_json=args.subject_info_json,
+        job_queue=job_queue,
+        create_subject=lambda subject, search_date: create_subject_instance(
+            args, subject, search_date, crawl_state, image_store=image_store
+        ),
+        get_search_dates=lambda: get_search_dates(args, date.today()) or [None],
+        interval_minutes=args.daemon_interval,
+        workers=args.workers,
+        job_retention_hours=args.job_retention_hours
+    ).run()
+
+    job_queue.close()
+
+
+def run_daemon_processes(args):
+    if args.processes == 1:
+        run_daemon(args)
+        return
+
+    log_queue = multiprocessing.Queue()
+    LoggingConfig.share_with_processes(log_queue)
+
+    processes = [multiprocessing.Process(target=run_daemon, args=(args, log_queue), name=f"CrawlDaemon-{i}")
+                 for i in range(args.processes)]
+    for process in processes:
+        process.start()
+
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        # An interrupt from the terminal reaches every process of the group; the others are interrupted here.
+        for process in processes:
+            process.join(CrawlDaemon.POLL_INTERVAL)
+            if process.is_alive():
+                os.kill(process.pid, signal.SIGINT)
+        for process in processes:
+            process.join()
+
+
 if __name__ == "__main__":
+    args = parse_arguments()
+
+    LoggingConfig.setup_logging(log_level=args.log_level, log_format=args.log_format, log_dir=args.log_dir,
+                                log_max_bytes=args.log_max_bytes, log_backup_count=args.log_backup_count)
     logging.info("==================== Naver Blog Crawler Start ====================")
 
-    args = parse_arguments()
     today = date.today()
-    (
-        output_directory_path, subject_info_json,
-        start_date, end_date, search_date,
-        order_by_sim, include_content_keyword,
-        count_per_page, max_search_page, min_image_count
-    ) = (
-        args.output, args.subject_info_json,
-        args.start_date, args.end_date, args.search_date,
-        args.order_by_sim, args.include_content_keyword,
-        args.count_per_page, args.max_search_page, args.min_image_count
-    )
 
-    subject_info = load_subject_info(subject_info_json)
+    subject_info = load_subject_info(args.subject_info_json)
 
-    if search_date:
-        search_dates = [search_date]
-    elif start_date and end_date:
-        search_dates = [today] if not start_date or not end_date else list(date_range(start_date, end_date))
-    else:
-        search_dates = None
+    os.makedirs(args.output, exist_ok=True)
+
+    search_dates = get_search_dates(args, today)
+    start_date, end_date = get_search_range(args, today)
 
     if search_dates:
         date_strings = ', '.join([d.strftime('%Y-%m-%d') for d in search_dates])
         logging.info(f"검색 기준 날짜: {date_strings}")
 
-    logging.info(f"Output Directory Path: {output_directory_path}")
+    logging.info(f"Output Directory Path: {args.output}")
 
-    if order_by_sim:
-        logging.info(f"Order by Similar Enabled (Max Search Page: {max_search_page})")
+    if args.order_by_sim:
+        logging.info(f"Order by Similar Enabled (Max Search Page: {args.max_search_page})")
 
-    if search_dates:
-        for subject in subject_info:
-            for search_date in search_dates:
-                formatted_date = search_date.strftime('%Y-%m-%d')
-                output_path = str(os.path.join(output_directory_path, subject["name"], formatted_date))
-                subject_instance = Subject(
-                    name=subject["name"],
-                    keywords=subject["keywords"],
-                    search_date=search_date,
-                    output_path=output_path,
-                    count_per_page=count_per_page,
-                    include_content_keyword=include_content_keyword,
-                    order_by_sim=order_by_sim,
-                    max_search_page=max_search_page,
-                    min_image_count=min_image_count
-                )
-                subject_instance.run()
+    if args.daemon:
+        run_daemon_processes(args)
     else:
-        today_formatted = date.today().strftime('%Y-%m-%d')
-        for subject in subject_info:
-            output_path = str(os.path.join(output_directory_path, subject["name"], f"(INF) {today_formatted}"))
-            subject_instance = Subject(
-                name=subject["name"],
-                keywords=subject["keywords"],
-                search_date=None,
-                output_path=output_path,
-                count_per_page=count_per_page,
-                include_content_keyword=include_content_keyword,
-                order_by_sim=order_by_sim,
-                max_search_page=max_search_page,
-                min_image_count=min_image_count
+        configure_metrics(args)
+        configure_base_urls(args)
+        configure_http_client(args)
+        configure_image_download_scheduler(args)
+        crawl_state = CrawlState(os.path.join(args.output, "crawl_state.db"))
+        image_store = create_image_store(args)
+
+        subject_instances = create_subject_instances(args, subject_info, search_dates, crawl_state,
+                                                     image_store=image_store)
+
+        if args.engine == 'async':
+            AsyncCrawlEngine(connections_per_host=args.connections_per_host).run(
+                subject_instances, start_date=start_date, end_date=end_date
             )
-            subject_instance.run()
+        else:
+            # A date range is searched once for all of its dates, and concurrent searches are run up front.
+            # Otherwise every subject streams its search pages into its post jobs.
+            if (start_date and end_date) or args.search_workers > 1:
+                Subject.search_subjects(subject_instances, start_date=start_date, end_date=end_date,
+                                        workers=args.search_workers)
+
+            for subject_instance in subject_instances:
+                subject_instance.run()
+
+        CrawlMetrics.log_summary()
+        CrawlMetrics.write_metrics_file()